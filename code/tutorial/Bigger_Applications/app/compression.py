@@ -0,0 +1,4 @@
+# 包内的响应压缩入口，实现在 tutorial/compression.py
+from . import tutorial_path  # noqa: F401
+
+from compression import CompressionMiddleware  # noqa: E402,F401
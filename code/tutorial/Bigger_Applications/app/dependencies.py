@@ -1,11 +1,17 @@
 from fastapi import Header, HTTPException
 
+from . import tutorial_path  # noqa: F401
+from pure_dependency import pure  # noqa: E402
 
+
+# 两个依赖项的结果只取决于请求头和查询参数，用 @pure 跨请求缓存，见 pure_dependency.py
+@pure
 async def get_token_header(x_token: str = Header(...)):
     if x_token != "fake-super-secret-token":
         raise HTTPException(status_code=400, detail="X-Token header invalid")
 
 
+@pure
 async def get_query_token(token: str):
     if token != "jessica":
         raise HTTPException(status_code=400, detail="No Jessica token provided")
\ No newline at end of file
@@ -1,11 +1,15 @@
 from fastapi import Depends, FastAPI
 
+from .compression import CompressionMiddleware
 from .dependencies import get_query_token, get_token_header
 from .internal import admin
 from .routers import items, users
 
 app = FastAPI(dependencies=[Depends(get_query_token)])
 
+# 响应压缩，见 compression.py
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
 
 app.include_router(users.router)
 app.include_router(items.router)
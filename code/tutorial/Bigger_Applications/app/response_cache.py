@@ -0,0 +1,4 @@
+# 包内的响应缓存入口，实现在 tutorial/response_cache.py
+from . import tutorial_path  # noqa: F401
+
+from response_cache import MemoryBackend, RedisBackend, ResponseCache  # noqa: E402,F401
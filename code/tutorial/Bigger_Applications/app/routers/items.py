@@ -9,6 +9,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 
 from ..dependencies import get_token_header
+from ..response_cache import MemoryBackend, ResponseCache
 
 router = APIRouter(
     prefix="/items",
@@ -20,13 +21,18 @@ router = APIRouter(
 
 fake_items_db = {"plumbus": {"name": "Plumbus"}, "gun": {"name": "Portal Gun"}}
 
+# 读取的响应带 ETag 缓存，修改 item 后对应的缓存失效
+response_cache = ResponseCache(MemoryBackend(maxsize=1024), ttl=60)
+
 
 @router.get("/")
+@response_cache.cached(tag="items")
 async def read_items():
     return fake_items_db
 
 
 @router.get("/{item_id}")
+@response_cache.cached(tag="item:{item_id}")
 async def read_item(item_id: str):
     if item_id not in fake_items_db:
         raise HTTPException(status_code=404, detail="Item not found")
@@ -38,6 +44,7 @@ async def read_item(item_id: str):
     tags=["custom"],
     responses={403: {"description": "Operation forbidden"}},
 )
+@response_cache.invalidates("items", "item:{item_id}")
 async def update_item(item_id: str):
     if item_id != "plumbus":
         raise HTTPException(
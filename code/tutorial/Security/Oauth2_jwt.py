@@ -27,8 +27,14 @@
 # pip install passlib[bcrypt]
 
 
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 
 from fastapi import Depends, FastAPI, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
@@ -36,6 +42,8 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
 
+from user_repository import InMemoryUserRepository, SqlUserRepository, UserRepository
+
 # 处理 JWT 令牌
 # 导入已安装的模块。
 # 创建一个随机密钥，该密钥将用于对 JWT 令牌进行签名。
@@ -81,34 +89,140 @@ class User(BaseModel):
 class UserInDB(User):
     hashed_password: str
 
+    # 仓库返回的是共享的缓存对象，不允许修改
+    class Config:
+        allow_mutation = False
+
+
+# 用户仓库：启动时构造好所有 UserInDB 并建立索引，请求中直接返回缓存的对象（见 user_repository.py）
+# 设置 USERS_BACKEND=sql 时改为从 sql_app 的数据库读取用户（需要把 Use_Orm 目录加入 PYTHONPATH）
+if os.environ.get("USERS_BACKEND") == "sql":
+    from sql_app.database import SessionLocal
+
+    users_repository: UserRepository = SqlUserRepository(SessionLocal, UserInDB)
+else:
+    users_repository = InMemoryUserRepository(fake_users_db, UserInDB)
+
 # 创建一个 PassLib 「上下文」。这将用于哈希和校验密码。
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 哈希成本可以调整，用 tune_password_hash.py 在目标机器上测出满足目标校验延迟的成本：
+# - PASSWORD_SCHEMES：第一个是新哈希使用的算法，其余的在 deprecated="auto" 下视为过时，
+#   例如改成 ["argon2", "bcrypt"]（需要 pip install argon2-cffi）后，旧的 bcrypt 哈希会在登录时升级为 argon2
+# - BCRYPT_ROUNDS：bcrypt 的成本因子，每加 1 校验时间翻倍
+PASSWORD_SCHEMES = ["bcrypt"]
+BCRYPT_ROUNDS = 12
+
+pwd_context = CryptContext(
+    schemes=PASSWORD_SCHEMES, deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 app = FastAPI()
 
 # 然后创建另一个工具函数，用于校验接收的密码是否与存储的哈希值匹配。
+# 存储的哈希不是 pwd_context 认识的格式时（例如 sql_app 的占位哈希），passlib 会抛出 ValueError，
+# 这里按密码错误处理，返回 401 而不是 500
 def verify_password(plain_password, hashed_password):
+    if pwd_context.identify(hashed_password, required=False) is None:
+        return False
     return pwd_context.verify(plain_password, hashed_password)
 
 # 创建一个工具函数以哈希来自用户的密码。
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# 校验密码，同时检查哈希是否过时（算法已弃用或成本与当前配置不同）。
+# 返回 (是否匹配, 新哈希)，只有密码正确且哈希需要升级时新哈希才不是 None。
+def verify_and_update_password(plain_password, hashed_password):
+    if pwd_context.identify(hashed_password, required=False) is None:
+        return False, None
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def get_user(db: UserRepository, username: str):
+    return db.get(username)
+
+# 在独立的线程池中计算密码哈希
+# bcrypt 校验一次约 250ms CPU，直接在 async def 路由里调用会阻塞事件循环，登录期间其他请求全部停顿。
+# bcrypt 计算时会释放 GIL，放到线程池里可以真正并行。
+# 使用单独的线程池而不是 FastAPI 默认的线程池，避免登录高峰占满其他同步路由要用的线程。
+# - PASSWORD_HASH_CONCURRENCY：同时进行的哈希计算数，一般不超过 CPU 核数
+# - PASSWORD_HASH_MAX_WAITING：排队等待的上限，超出时直接返回 503，而不是让排队无限增长（背压）
+PASSWORD_HASH_CONCURRENCY = 4
+PASSWORD_HASH_MAX_WAITING = 64
+
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix="password-hash"
+)
+
+
+class PasswordHashLimiter:
+    def __init__(self, concurrency: int, max_waiting: int):
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def run(self, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self.waiting >= self.max_waiting:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent logins, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(password_executor, func, *args)
+        finally:
+            self._semaphore.release()
+
+
+password_hash_limiter = PasswordHashLimiter(
+    PASSWORD_HASH_CONCURRENCY, PASSWORD_HASH_MAX_WAITING
+)
+
+
+async def verify_password_async(plain_password, hashed_password):
+    return await password_hash_limiter.run(
+        verify_password, plain_password, hashed_password
+    )
+
+
+async def verify_and_update_password_async(plain_password, hashed_password):
+    return await password_hash_limiter.run(
+        verify_and_update_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password):
+    return await password_hash_limiter.run(get_password_hash, password)
+
+
+# 登录成功时如果存储的哈希已经过时，用当前配置重新哈希并保存。
+# 只有登录时才能拿到明文密码，所以升级只能在这里进行。
+def update_password_hash(db: UserRepository, username: str, new_hash: str):
+    db.update_hashed_password(username, new_hash)
 
-def get_user(db, username: str):
-    if username in db:
-        user_dict = db[username]
-        return UserInDB(**user_dict)
 
 # 再创建另一个工具函数用于认证并返回用户。
-def authenticate_user(fake_db, username: str, password: str):
-    user = get_user(fake_db, username)
+async def authenticate_user(db: UserRepository, username: str, password: str):
+    user = get_user(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password_async(
+        password, user.hashed_password
+    )
+    if not valid:
         return False
+    if new_hash:
+        update_password_hash(db, username, new_hash)
     return user
 
 # 创建一个生成新的访问令牌的工具函数。
@@ -122,6 +236,78 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# 缓存已校验的令牌
+# 同一个客户端在令牌有效期内会带着同一个令牌发出很多请求，每次都 jwt.decode（HMAC 校验 + JSON 解析）是重复劳动。
+# 校验通过后，以令牌的 SHA-256 摘要为键缓存解码出的 claims，缓存项在令牌的 exp 时刻失效，
+# 过期的令牌会重新走 jwt.decode，从而得到正常的过期错误。
+# 缓存有容量上限，超出时淘汰最久未使用的项。
+TOKEN_CACHE_MAXSIZE = 10000
+
+
+class TokenCache:
+    def __init__(self, maxsize: int = TOKEN_CACHE_MAXSIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self.key(token)
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, payload = entry
+        if expires <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return payload
+
+    def set(self, token: str, payload: dict):
+        exp = payload.get("exp")
+        if exp is None:
+            return
+        self._data[self.key(token)] = (float(exp), payload)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+token_cache = TokenCache()
+
+
+# 认证耗时统计，用于比较启用缓存前后的开销
+class AuthTimings:
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.decode_ns = 0
+        self.lookup_ns = 0
+
+    def snapshot(self) -> dict:
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "decode_avg_us": self.decode_ns / requests / 1000,
+            "lookup_avg_us": self.lookup_ns / requests / 1000,
+        }
+
+
+auth_timings = AuthTimings()
+
+
+def decode_token(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is not None:
+        auth_timings.cache_hits += 1
+        return payload
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    token_cache.set(token, payload)
+    return payload
+
+
 # 更新 get_current_user 以接收与之前相同的令牌，但这次使用的是 JWT 令牌。
 # 解码接收到的令牌，对其进行校验，然后返回当前用户。
 # 如果令牌无效，立即返回一个 HTTP 错误。
@@ -131,15 +317,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    auth_timings.requests += 1
+    start = time.perf_counter_ns()
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = get_user(fake_users_db, username=token_data.username)
+    finally:
+        decoded = time.perf_counter_ns()
+        auth_timings.decode_ns += decoded - start
+    user = get_user(users_repository, username=token_data.username)
+    auth_timings.lookup_ns += time.perf_counter_ns() - decoded
     if user is None:
         raise credentials_exception
     return user
@@ -150,11 +342,22 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+
+# 设置环境变量 DEPENDENCY_PROFILER=1 时，记录 get_current_active_user → get_current_user → oauth2_scheme
+# 每一层的耗时，登录后在 /admin/profile 查看，见 dependency_profiler.py
+# dependency_profiler.py 在 tutorial 目录下，开启时需要把它加入 PYTHONPATH
+if os.environ.get("DEPENDENCY_PROFILER") == "1":
+    from dependency_profiler import enable_dependency_profiler
+
+    enable_dependency_profiler(app, dependencies=[Depends(get_current_active_user)])
+
 # 使用令牌的过期时间创建一个 timedelta 对象。
 # 创建一个真实的 JWT 访问令牌并返回它。
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(fake_users_db, form_data.username, form_data.password)
+    user = await authenticate_user(
+        users_repository, form_data.username, form_data.password
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -178,6 +381,12 @@ async def read_own_items(current_user: User = Depends(get_current_active_user)):
     return [{"item_id": "Foo", "owner": current_user.username}]
 
 
+# 认证开销：请求数、令牌缓存命中数、平均解码耗时和平均用户查询耗时（微秒）
+@app.get("/auth/metrics")
+async def read_auth_metrics():
+    return auth_timings.snapshot()
+
+
 """
 关于 JWT 「主题」 sub 的技术细节
 JWT 的规范中提到有一个 sub 键，值为该令牌的主题。
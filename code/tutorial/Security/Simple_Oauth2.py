@@ -18,6 +18,8 @@ from fastapi import Depends, FastAPI, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 
+from user_repository import InMemoryUserRepository, UserRepository
+
 fake_users_db = {
     "johndoe": {
         "username": "johndoe",
@@ -55,17 +57,23 @@ class User(BaseModel):
 class UserInDB(User):
     hashed_password: str
 
+    # 仓库返回的是共享的缓存对象，不允许修改
+    class Config:
+        allow_mutation = False
+
+
+# 启动时构造好所有用户对象，请求中按用户名直接取出，不再每次构造 UserInDB（见 user_repository.py）
+users_repository = InMemoryUserRepository(fake_users_db, UserInDB)
 
-def get_user(db, username: str):
-    if username in db:
-        user_dict = db[username]
-        return UserInDB(**user_dict)
+
+def get_user(db: UserRepository, username: str):
+    return db.get(username)
 
 
 def fake_decode_token(token):
     # This doesn't provide any security at all
     # Check the next version
-    user = get_user(fake_users_db, token)
+    user = get_user(users_repository, token)
     return user
 
 
@@ -99,10 +107,9 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     # 现在，使用表单字段中的 username 从（伪）数据库中获取用户数据。
     # 如果没有这个用户，我们将返回一个错误消息，提示「用户名或密码错误」。
     # 对于这个错误，我们使用 HTTPException 异常：
-    user_dict = fake_users_db.get(form_data.username)
-    if not user_dict:
+    user = get_user(users_repository, form_data.username)
+    if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    user = UserInDB(**user_dict)
     hashed_password = fake_hash_password(form_data.password)
     if not hashed_password == user.hashed_password:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
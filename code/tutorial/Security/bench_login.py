@@ -0,0 +1,75 @@
+# 登录高峰期间 /users/me/ 的延迟
+# 持续发起并发登录请求，同时逐个请求 /users/me/，统计其 p50/p99 延迟。
+# 对比两种情况：
+# - inline：在事件循环中直接调用 bcrypt（改动前的行为）
+# - pool：通过 PasswordHashLimiter 放到独立线程池中计算
+# 在 Security 目录下运行：python bench_login.py
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import Oauth2_jwt
+
+CONCURRENT_LOGINS = 16
+DURATION = 5.0
+PROBE_INTERVAL = 0.01
+
+
+async def inline_run(func, *args):
+    return func(*args)
+
+
+async def login_storm(client: httpx.AsyncClient, stop: asyncio.Event):
+    form = {"username": "johndoe", "password": "secret"}
+    while not stop.is_set():
+        await client.post("/token", data=form)
+
+
+async def probe(client: httpx.AsyncClient, token: str, stop: asyncio.Event):
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    # 按固定节奏计划请求时间，延迟从计划时间算起，
+    # 否则事件循环被阻塞时探测请求本身也发不出去，阻塞的时间就统计不到了
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await client.get("/users/me/", headers=headers)
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+        scheduled += PROBE_INTERVAL
+    return latencies
+
+
+async def run(label: str):
+    token = Oauth2_jwt.create_access_token({"sub": "johndoe"})
+    async with httpx.AsyncClient(app=Oauth2_jwt.app, base_url="http://test") as client:
+        stop = asyncio.Event()
+        storms = [
+            asyncio.create_task(login_storm(client, stop))
+            for _ in range(CONCURRENT_LOGINS)
+        ]
+        probe_task = asyncio.create_task(probe(client, token, stop))
+        await asyncio.sleep(DURATION)
+        stop.set()
+        latencies = await probe_task
+        await asyncio.gather(*storms)
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{label:>6}: {len(latencies):>5} probes  "
+        f"p50 {quantiles[49]:>8.2f} ms  p99 {quantiles[98]:>8.2f} ms"
+    )
+
+
+async def main():
+    pooled_run = Oauth2_jwt.password_hash_limiter.run
+    Oauth2_jwt.password_hash_limiter.run = inline_run
+    await run("inline")
+    Oauth2_jwt.password_hash_limiter.run = pooled_run
+    await run("pool")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+# 选择密码哈希成本
+# 哈希成本越高，暴力破解越慢，但每次登录消耗的 CPU 也越多。
+# 在部署的机器上运行本脚本，测出各成本下一次校验的耗时，选出不超过目标延迟的最高成本，
+# 再把结果写到 Oauth2_jwt.py 的 BCRYPT_ROUNDS（或 argon2 参数）中。
+# python tune_password_hash.py --target-ms 250
+import argparse
+import statistics
+import time
+
+from passlib.context import CryptContext
+
+try:
+    import argon2
+except ImportError:
+    argon2 = None
+
+SAMPLES = 5
+PASSWORD = "correct horse battery staple"
+
+
+def median_verify_ms(context: CryptContext) -> float:
+    hashed = context.hash(PASSWORD)
+    timings = []
+    for _ in range(SAMPLES):
+        start = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def tune_bcrypt(target_ms: float):
+    best = None
+    for rounds in range(8, 17):
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        ms = median_verify_ms(context)
+        print(f"bcrypt rounds={rounds:<2} {ms:>9.1f} ms")
+        if ms > target_ms:
+            break
+        best = rounds
+    return best
+
+
+def tune_argon2(target_ms: float):
+    best = None
+    for memory_cost in (19456, 47104, 65536):
+        for time_cost in range(1, 7):
+            context = CryptContext(
+                schemes=["argon2"],
+                argon2__memory_cost=memory_cost,
+                argon2__time_cost=time_cost,
+                argon2__parallelism=1,
+            )
+            ms = median_verify_ms(context)
+            print(f"argon2 m={memory_cost:<6} t={time_cost} {ms:>9.1f} ms")
+            if ms > target_ms:
+                break
+            best = (memory_cost, time_cost)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target-ms", type=float, default=250)
+    args = parser.parse_args()
+
+    rounds = tune_bcrypt(args.target_ms)
+    print(f"-> BCRYPT_ROUNDS = {rounds}")
+    if argon2 is not None:
+        params = tune_argon2(args.target_ms)
+        if params:
+            print(f"-> argon2__memory_cost={params[0]}, argon2__time_cost={params[1]}")
+    else:
+        print("argon2-cffi is not installed, skipping argon2")
+
+
+if __name__ == "__main__":
+    main()
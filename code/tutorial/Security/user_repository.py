@@ -0,0 +1,136 @@
+# 用户仓库
+# 之前的例子都用 get_user(fake_users_db, username) 从 dict 中取出数据，每个请求都重新构造一次 UserInDB。
+# 这里把「按用户名查用户」抽象成仓库：
+# - UserRepository：仓库的接口，换成数据库时实现这三个方法即可
+# - InMemoryUserRepository：启动时把所有用户构造成模型对象并按用户名、Email 建索引，用于示例和测试
+# - SqlUserRepository：从 sql_app 的数据库中读取用户，并缓存构造好的模型对象
+# 返回的都是缓存的同一个对象，get_current_user 不再需要每次构造模型。
+# 对象是共享的，所以模型应当设置为不可变（Config.allow_mutation = False），修改数据要通过仓库进行。
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+
+class UserRepository(ABC):
+    @abstractmethod
+    def get(self, username: str) -> Optional[BaseModel]:
+        ...
+
+    @abstractmethod
+    def get_by_email(self, email: str) -> Optional[BaseModel]:
+        ...
+
+    @abstractmethod
+    def update_hashed_password(self, username: str, hashed_password: str):
+        ...
+
+
+class InMemoryUserRepository(UserRepository):
+    def __init__(self, users: Dict[str, dict], model: Type[BaseModel]):
+        self.model = model
+        self._by_username: Dict[str, BaseModel] = {}
+        self._by_email: Dict[str, BaseModel] = {}
+        for user_dict in users.values():
+            self._add(model(**user_dict))
+
+    def _add(self, user):
+        self._by_username[user.username] = user
+        if user.email:
+            self._by_email[user.email] = user
+
+    def get(self, username: str):
+        return self._by_username.get(username)
+
+    def get_by_email(self, email: str):
+        return self._by_email.get(email)
+
+    # 对象不可变，更新时用 copy 生成新对象替换索引中的旧对象
+    def update_hashed_password(self, username: str, hashed_password: str):
+        user = self._by_username[username]
+        self._add(user.copy(update={"hashed_password": hashed_password}))
+
+
+
+# 从 sql_app 数据库读取用户，需要把 Use_Orm 目录加入 PYTHONPATH：
+# USERS_BACKEND=sql PYTHONPATH=../Use_Orm uvicorn Oauth2_jwt:app
+# sql_app 的用户没有 username 和 full_name，这里用 Email 作为用户名，用 is_active 推出 disabled。
+# 缓存是有大小上限（maxsize）的 LRU，缓存项在 ttl 秒后过期，以便看到其他进程对数据库的修改。
+# 不存在的用户不缓存：用户名由客户端任意填写，缓存它们只会挤掉真正的用户。
+# sql_app 的 crud.create_user 保存的不是 bcrypt 哈希，这样的用户无法登录（校验时视为密码错误，见 Oauth2_jwt.py）。
+class SqlUserRepository(UserRepository):
+    def __init__(
+        self, session_factory, model: Type[BaseModel], ttl: float = 60, maxsize: int = 10000
+    ):
+        from sql_app import models
+
+        self.models = models
+        self.session_factory = session_factory
+        self.model = model
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # 用户名 -> (过期时间, 用户)
+        self._cache: "OrderedDict[str, Tuple[float, BaseModel]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _to_model(self, db_user):
+        return self.model(
+            username=db_user.email,
+            email=db_user.email,
+            full_name=None,
+            disabled=not db_user.is_active,
+            hashed_password=db_user.hashed_password,
+        )
+
+    def _cached(self, username: str, now: float) -> Optional[BaseModel]:
+        with self._lock:
+            entry = self._cache.get(username)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._cache[username]
+                return None
+            self._cache.move_to_end(username)
+            return entry[1]
+
+    def get(self, username: str):
+        now = time.monotonic()
+        user = self._cached(username, now)
+        if user is not None:
+            return user
+        db = self.session_factory()
+        try:
+            db_user = (
+                db.query(self.models.User)
+                .filter(self.models.User.email == username)
+                .first()
+            )
+        finally:
+            db.close()
+        if db_user is None:
+            return None
+        user = self._to_model(db_user)
+        with self._lock:
+            self._cache[username] = (now + self.ttl, user)
+            self._cache.move_to_end(username)
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return user
+
+    def get_by_email(self, email: str):
+        return self.get(email)
+
+    def update_hashed_password(self, username: str, hashed_password: str):
+        db = self.session_factory()
+        try:
+            db.query(self.models.User).filter(
+                self.models.User.email == username
+            ).update({"hashed_password": hashed_password})
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            self._cache.pop(username, None)
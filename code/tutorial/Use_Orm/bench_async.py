@@ -0,0 +1,76 @@
+# 同步与异步实现的并发对比
+# 同步路由在 anyio 线程池中运行，默认最多 40 个工作线程，同时执行中的查询也就不会超过 40；
+# 异步路由在事件循环中等待 IO，同时执行中的查询数只受连接数限制。
+# 在 Use_Orm 目录下运行：python bench_async.py
+import asyncio
+import os
+import tempfile
+import time
+
+CONCURRENCY = 200
+ROUNDS = 5
+
+tmpdir = tempfile.mkdtemp()
+os.environ["SQL_APP_DATABASE_URL"] = f"sqlite:///{tmpdir}/bench.db"
+os.environ["SQL_APP_ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{tmpdir}/bench.db"
+# 连接池容量放大到并发数，让瓶颈只剩线程池本身
+os.environ["SQL_APP_POOL_SIZE"] = str(CONCURRENCY)
+os.environ["SQL_APP_MAX_OVERFLOW"] = "0"
+
+import httpx  # noqa: E402
+from sqlalchemy import event, insert  # noqa: E402
+
+from sql_app import async_main, main, models  # noqa: E402
+from sql_app.async_database import async_engine  # noqa: E402
+from sql_app.database import engine  # noqa: E402
+
+
+# 统计同一时刻正在执行的 SQL 语句数量的峰值
+class PeakInFlight:
+    def __init__(self, sync_engine):
+        self.current = 0
+        self.peak = 0
+        event.listen(sync_engine, "before_cursor_execute", self.before)
+        event.listen(sync_engine, "after_cursor_execute", self.after)
+
+    def before(self, *args):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def after(self, *args):
+        self.current -= 1
+
+
+def seed(count: int = 1000):
+    rows = [
+        {"email": f"user{i}@example.com", "hashed_password": "x", "is_active": True}
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), rows)
+
+
+async def run(app, sync_engine) -> None:
+    peak = PeakInFlight(sync_engine)
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            await asyncio.gather(
+                *(client.get("/users/?limit=100") for _ in range(CONCURRENCY))
+            )
+        elapsed = time.perf_counter() - start
+    total = CONCURRENCY * ROUNDS
+    print(f"{total / elapsed:>10.1f} req/s  peak in-flight queries: {peak.peak}")
+
+
+async def bench():
+    print("sync: ", end="")
+    await run(main.app, engine)
+    print("async:", end="")
+    await run(async_main.app, async_engine.sync_engine)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    seed()
+    asyncio.run(bench())
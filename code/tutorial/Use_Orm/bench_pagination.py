@@ -0,0 +1,51 @@
+# 对比 OFFSET 分页与游标分页在表变大时的延迟
+# 在 Use_Orm 目录下运行：python bench_pagination.py
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from sql_app import crud, models
+
+TABLE_SIZES = [10_000, 100_000, 500_000]
+PAGE_SIZE = 100
+REPEAT = 20
+
+
+def fill_users(engine, count: int):
+    rows = [
+        {"email": f"user{i}@example.com", "hashed_password": "x", "is_active": True}
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), rows)
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    print(f"{'rows':>8} {'offset(ms)':>12} {'cursor(ms)':>12}")
+    for size in TABLE_SIZES:
+        engine = create_engine("sqlite://")
+        models.Base.metadata.create_all(bind=engine)
+        fill_users(engine, size)
+        db = sessionmaker(bind=engine)()
+
+        # 读取最后一页，OFFSET 需要跳过几乎整张表
+        skip = size - PAGE_SIZE
+        after = db.query(models.User.id).order_by(models.User.id).offset(skip - 1).first()[0]
+
+        offset_ms = timed(lambda: crud.get_users(db, skip=skip, limit=PAGE_SIZE))
+        cursor_ms = timed(lambda: crud.get_users(db, limit=PAGE_SIZE, after=after))
+        print(f"{size:>8} {offset_ms:>12.3f} {cursor_ms:>12.3f}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
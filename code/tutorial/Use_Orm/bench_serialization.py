@@ -0,0 +1,89 @@
+# 对比默认序列化（jsonable_encoder + json.dumps）与快速 JSON 模式（orjson）
+# 路由返回 1k/10k 个带 items 的用户，response_model=List[schemas.User]，
+# 直接调用 ASGI 接口，测量从路由返回到响应体生成完毕的耗时
+# 在 Use_Orm 目录下运行（fast_json.py 在上一级目录）：PYTHONPATH=.. python bench_serialization.py
+import asyncio
+import time
+from typing import List
+
+from fastapi import FastAPI
+
+from fast_json import enable_fast_json
+from sql_app import models, schemas
+
+ROW_COUNTS = [1_000, 10_000]
+ITEMS_PER_USER = 5
+REPEAT = 5
+
+
+def make_users(count: int) -> List[models.User]:
+    users = []
+    for i in range(count):
+        user = models.User(id=i, email=f"user{i}@example.com", is_active=True)
+        user.items = [
+            models.Item(id=i * ITEMS_PER_USER + j, title=f"item {j}", owner_id=i)
+            for j in range(ITEMS_PER_USER)
+        ]
+        users.append(user)
+    return users
+
+
+def make_app(users, fast: bool) -> FastAPI:
+    app = FastAPI()
+    if fast:
+        enable_fast_json(app)
+
+    @app.get("/users/", response_model=List[schemas.User])
+    def read_users():
+        return users
+
+    return app
+
+
+async def request(app) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/users/",
+        "raw_path": b"/users/",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "client": ("127.0.0.1", 12345),
+        "server": ("testserver", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return sum(len(chunk) for chunk in body)
+
+
+async def timed(app) -> float:
+    await request(app)
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        await request(app)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    print(f"{'rows':>6} {'default(ms)':>12} {'fast(ms)':>10} {'speedup':>8}")
+    for count in ROW_COUNTS:
+        users = make_users(count)
+        default_ms = asyncio.run(timed(make_app(users, fast=False)))
+        fast_ms = asyncio.run(timed(make_app(users, fast=True)))
+        print(f"{count:>6} {default_ms:>12.1f} {fast_ms:>10.1f} {default_ms / fast_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
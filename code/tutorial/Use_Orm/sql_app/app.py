@@ -0,0 +1,9 @@
+# 根据配置选择同步或异步实现，两者共用 schemas.py 和相同的路由
+# uvicorn sql_app.app:app                        # 同步（默认）
+# SQL_APP_DB_MODE=async uvicorn sql_app.app:app  # 异步
+from .config import settings
+
+if settings.db_mode == "async":
+    from .async_main import app
+else:
+    from .main import app
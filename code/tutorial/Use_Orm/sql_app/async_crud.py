@@ -0,0 +1,170 @@
+# crud.py 的异步版本
+# 函数名和参数与 crud.py 保持一致，返回同样的 ORM 实例，因此可以共用 schemas.py 中的模型
+
+# 注意：AsyncSession 中不能懒加载关系属性，
+# 要序列化 schemas.User（包含 items）时必须使用 selectin 或 joined 加载策略
+
+from typing import List, Optional, Set
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas
+from .crud import (
+    LOADER_STRATEGIES,
+    chunked,
+    export_items_stmt,
+    export_users_stmt,
+    fake_hash_password,
+    ids_from_results,
+    inserted_ids_stmts,
+)
+
+
+def user_select(load: str = "lazy"):
+    stmt = select(models.User)
+    loader = LOADER_STRATEGIES[load]
+    if loader is not None:
+        stmt = stmt.options(loader(models.User.items))
+    return stmt
+
+
+async def get_user(db: AsyncSession, user_id: int, load: str = "lazy"):
+    result = await db.execute(user_select(load).filter(models.User.id == user_id))
+    return result.unique().scalars().first()
+
+
+async def get_user_by_email(db: AsyncSession, email: str, load: str = "lazy"):
+    result = await db.execute(user_select(load).filter(models.User.email == email))
+    return result.unique().scalars().first()
+
+
+async def get_users(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[int] = None,
+    load: str = "lazy",
+):
+    # 与 crud.get_users 相同，两种分页都按 id 排序
+    stmt = user_select(load).order_by(models.User.id)
+    if after is not None:
+        stmt = stmt.filter(models.User.id > after)
+    else:
+        stmt = stmt.offset(skip)
+    result = await db.execute(stmt.limit(limit))
+    return result.unique().scalars().all()
+
+
+# 使用服务端游标分批读取，每次 await 一批
+async def iter_users(db: AsyncSession, batch_size: int = 1000, load: str = "lazy"):
+    result = await db.stream(export_users_stmt(batch_size, load))
+    async for partition in result.scalars().partitions(batch_size):
+        yield partition
+
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    fake_hashed_password = fake_hash_password(user.password)
+
+    # 新用户还没有 items，直接初始化为空列表，避免序列化时触发懒加载
+    db_user = models.User(
+        email=user.email, hashed_password=fake_hashed_password, items=[]
+    )
+    db.add(db_user)
+    # expire_on_commit=False 且主键在 flush 时已经回填，这里不需要 refresh
+    await db.commit()
+    return db_user
+
+
+async def get_items(
+    db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[int] = None
+):
+    stmt = select(models.Item).order_by(models.Item.id)
+    if after is not None:
+        stmt = stmt.filter(models.Item.id > after)
+    else:
+        stmt = stmt.offset(skip)
+    result = await db.execute(stmt.limit(limit))
+    return result.scalars().all()
+
+
+async def iter_items(db: AsyncSession, batch_size: int = 1000):
+    result = await db.stream(export_items_stmt(batch_size))
+    async for partition in result.scalars().partitions(batch_size):
+        yield partition
+
+
+async def create_user_item(db: AsyncSession, item: schemas.ItemCreate, user_id: int):
+    db_item = models.Item(**item.dict(), owner_id=user_id)
+    db.add(db_item)
+    await db.commit()
+    return db_item
+
+
+# 批量创建，思路见 crud.py
+async def bulk_insert(
+    db: AsyncSession, model, rows: List[dict], key: Optional[str] = None
+) -> List[int]:
+    table = model.__table__
+    dialect = db.bind.dialect
+    if not rows:
+        return []
+    if dialect.full_returning:
+        ids = []
+        for chunk in chunked(rows):
+            result = await db.execute(
+                insert(table).values(chunk).returning(table.c.id)
+            )
+            ids.extend(result.scalars())
+    elif key is not None or dialect.name == "sqlite":
+        for chunk in chunked(rows):
+            await db.execute(insert(table), chunk)
+        results = [
+            (await db.execute(stmt)).scalars().all()
+            for stmt in inserted_ids_stmts(table, rows, key)
+        ]
+        ids = ids_from_results(results, rows, key)
+    else:
+        objs = [model(**row) for row in rows]
+        db.add_all(objs)
+        await db.flush()
+        ids = [obj.id for obj in objs]
+    await db.commit()
+    return ids
+
+
+async def get_existing_emails(db: AsyncSession, emails: List[str]) -> Set[str]:
+    existing = set()
+    for chunk in chunked(emails):
+        result = await db.execute(
+            select(models.User.email).filter(models.User.email.in_(chunk))
+        )
+        existing.update(result.scalars())
+    return existing
+
+
+async def create_users(db: AsyncSession, users: List[schemas.UserCreate]):
+    rows = [
+        {"email": user.email, "hashed_password": fake_hash_password(user.password)}
+        for user in users
+    ]
+    ids = await bulk_insert(db, models.User, rows, key="email")
+    users = []
+    for chunk in chunked(ids):
+        stmt = user_select("selectin").filter(models.User.id.in_(chunk))
+        result = await db.execute(stmt.order_by(models.User.id))
+        users.extend(result.scalars())
+    return users
+
+
+async def create_user_items(
+    db: AsyncSession, items: List[schemas.ItemCreate], user_id: int
+):
+    rows = [{**item.dict(), "owner_id": user_id} for item in items]
+    ids = await bulk_insert(db, models.Item, rows)
+    db_items = []
+    for chunk in chunked(ids):
+        stmt = select(models.Item).filter(models.Item.id.in_(chunk))
+        result = await db.execute(stmt.order_by(models.Item.id))
+        db_items.extend(result.scalars())
+    return db_items
@@ -0,0 +1,24 @@
+# 异步版本的 SQLAlchemy 组件
+# 需要 SQLAlchemy 1.4+ 以及异步驱动：
+# pip install aiosqlite        # 本地 SQLite
+# pip install asyncpg          # 生产环境 PostgreSQL
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from .config import settings
+from .pool import TimedAsyncQueuePool, configure_engine, engine_options
+
+ASYNC_SQLALCHEMY_DATABASE_URL = settings.async_database_url
+
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    **engine_options(ASYNC_SQLALCHEMY_DATABASE_URL, TimedAsyncQueuePool),
+)
+# 事件需要注册在异步引擎内部的同步引擎上
+configure_engine(async_engine.sync_engine, ASYNC_SQLALCHEMY_DATABASE_URL)
+
+# expire_on_commit=False：提交后不让实例过期，
+# 否则之后访问属性会触发隐式 IO，而 AsyncSession 不允许隐式 IO
+AsyncSessionLocal = sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
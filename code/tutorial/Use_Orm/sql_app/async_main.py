@@ -0,0 +1,155 @@
+# main.py 的异步版本
+# 路由都是 async def，数据库 IO 通过 AsyncSession 在事件循环中等待，不再占用线程池的工作线程
+from typing import List, Optional
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import async_crud, cache, crud, models, schemas
+from .async_database import AsyncSessionLocal, async_engine
+from .compression import CompressionMiddleware
+from .export import EXPORT_BATCH_SIZE, MEDIA_TYPES, aiter_export
+from .pagination import get_after_id, next_cursor
+from .pool import pool_metrics
+
+app = FastAPI()
+
+# 用户列表和导出的响应体较大，压缩后再发送，见 compression.py
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+
+# create_all 是同步 API，需要通过 run_sync 在异步连接上执行
+@app.on_event("startup")
+async def create_tables():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+
+# Dependency
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@app.post("/users/", response_model=schemas.User)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await cache.get_user_by_email_async(db, email=user.email)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    db_user = await async_crud.create_user(db=db, user=user)
+    cache.user_cache.invalidate_email(user.email)
+    return db_user
+
+
+@app.get("/users/", response_model=List[schemas.User])
+async def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = Depends(get_after_id),
+    db: AsyncSession = Depends(get_db),
+):
+    users = await async_crud.get_users(
+        db, skip=skip, limit=limit, after=after_id, load="selectin"
+    )
+    cursor = next_cursor(users, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return users
+
+
+@app.get("/users/export")
+async def export_users(
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|json)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    batches = async_crud.iter_users(db, batch_size=EXPORT_BATCH_SIZE, load="selectin")
+    return StreamingResponse(
+        aiter_export(batches, schemas.User, export_format),
+        media_type=MEDIA_TYPES[export_format],
+    )
+
+
+# 响应缓存命中时不执行 read_user；If-None-Match 与 ETag 相同时返回 304
+@app.get("/users/{user_id}", response_model=schemas.User)
+@cache.response_cache.cached(tag="user:{user_id}")
+async def read_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    db_user = await cache.get_user_async(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return db_user
+
+
+@app.post("/users/bulk", response_model=List[schemas.User])
+async def create_users_bulk(
+    users: List[schemas.UserCreate], db: AsyncSession = Depends(get_db)
+):
+    existing = await async_crud.get_existing_emails(db, [user.email for user in users])
+    duplicates = crud.find_duplicate_emails(users, existing)
+    if duplicates:
+        raise HTTPException(
+            status_code=400,
+            detail={"msg": "Email already registered", "emails": duplicates},
+        )
+    db_users = await async_crud.create_users(db=db, users=users)
+    cache.user_cache.invalidate_email(*(user.email for user in users))
+    return db_users
+
+
+@app.post("/users/{user_id}/items/", response_model=schemas.Item)
+async def create_item_for_user(
+    user_id: int, item: schemas.ItemCreate, db: AsyncSession = Depends(get_db)
+):
+    db_item = await async_crud.create_user_item(db=db, item=item, user_id=user_id)
+    cache.user_cache.invalidate_user(user_id)
+    return db_item
+
+
+@app.post("/users/{user_id}/items/bulk", response_model=List[schemas.Item])
+async def create_items_for_user_bulk(
+    user_id: int, items: List[schemas.ItemCreate], db: AsyncSession = Depends(get_db)
+):
+    db_items = await async_crud.create_user_items(db=db, items=items, user_id=user_id)
+    cache.user_cache.invalidate_user(user_id)
+    return db_items
+
+
+@app.get("/items/", response_model=List[schemas.Item])
+async def read_items(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = Depends(get_after_id),
+    db: AsyncSession = Depends(get_db),
+):
+    items = await async_crud.get_items(db, skip=skip, limit=limit, after=after_id)
+    cursor = next_cursor(items, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return items
+
+
+@app.get("/items/export")
+async def export_items(
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|json)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    batches = async_crud.iter_items(db, batch_size=EXPORT_BATCH_SIZE)
+    return StreamingResponse(
+        aiter_export(batches, schemas.Item, export_format),
+        media_type=MEDIA_TYPES[export_format],
+    )
+
+
+@app.get("/metrics/pool")
+async def read_pool_metrics():
+    return pool_metrics(async_engine.sync_engine)
+
+
+@app.get("/metrics/cache")
+async def read_cache_metrics():
+    return {
+        "users": cache.user_cache.stats.snapshot(),
+        "responses": cache.response_cache.stats.snapshot(),
+    }
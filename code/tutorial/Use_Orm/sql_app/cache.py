@@ -0,0 +1,267 @@
+# 用户读缓存（read-through）
+# 热点用户被反复读取，每次都查数据库没有必要。
+# 读取时先查缓存，未命中再查数据库并写入缓存；写入相关数据时删除对应的缓存项。
+
+# 缓存的内容：
+# - user:id:{id}       -> schemas.User 的 dict（包含 items）
+# - user:email:{email} -> 用户 id，再通过 user:id 取到用户数据
+# 这样用户数据只存一份，新增 item 时只需要删除 user:id:{id} 一个键。
+
+# 使用 Redis 时，异步路由中的缓存读写仍然是阻塞调用，延迟应远小于数据库查询。
+
+# GET /users/{user_id} 还通过 response_cache 缓存了序列化后的响应，支持 ETag/304，
+# invalidate_user 会一起使它失效，见 response_cache.py。
+
+# 后端可以替换：
+# - LRUCache：进程内的 LRU + TTL，默认使用
+# - RedisCache：任何实现了 get/set(ex=)/delete 的 Redis 协议客户端，例如 redis.Redis
+# - LocalRedis：进程内模拟的 Redis 客户端，测试时代替真正的 Redis
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import async_crud, crud, schemas
+from .config import settings
+from .response_cache import MemoryBackend, RedisBackend, ResponseCache
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+# 同步路由在线程池中并发更新计数，需要加锁
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+        }
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+# 进程内的 Redis 客户端替身，只实现 RedisCache 用到的命令
+class LocalRedis:
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[name]
+                return None
+            return value
+
+    def set(self, name: str, value, ex: Optional[float] = None):
+        if isinstance(value, str):
+            value = value.encode()
+        expires = time.monotonic() + ex if ex else None
+        with self._lock:
+            self._data[name] = (expires, value)
+        return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+
+class RedisCache:
+    def __init__(self, client, ttl: float = 60, prefix: str = "sql_app:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key: str, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(self.ttl))
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+
+def user_key(user_id: int) -> str:
+    return f"user:id:{user_id}"
+
+
+def email_key(email: str) -> str:
+    return f"user:email:{email}"
+
+
+# 响应缓存（response_cache.py）中单个用户的 tag
+def user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+class UserCache:
+    def __init__(self, backend, response_cache: Optional[ResponseCache] = None):
+        self.backend = backend
+        self.response_cache = response_cache
+        self.stats = CacheStats()
+
+    def _get_user(self, user_id: int) -> Optional[schemas.User]:
+        value = self.backend.get(user_key(user_id))
+        if value is None:
+            return None
+        return schemas.User(**value)
+
+    # 每次查找只计一次命中或未命中
+    def cached_user(self, user_id: int) -> Optional[schemas.User]:
+        user = self._get_user(user_id)
+        self.stats.record(user is not None)
+        return user
+
+    # 按 Email 查找要读两个键，两个都命中才算命中
+    def cached_user_by_email(self, email: str) -> Optional[schemas.User]:
+        user_id = self.backend.get(email_key(email))
+        user = self._get_user(user_id) if user_id is not None else None
+        self.stats.record(user is not None)
+        return user
+
+    def store_user(self, db_user) -> schemas.User:
+        user = schemas.User.from_orm(db_user)
+        self.backend.set(user_key(user.id), user.dict())
+        self.backend.set(email_key(user.email), user.id)
+        return user
+
+    # 新增用户：删除该 Email 的索引
+    def invalidate_email(self, *emails: str):
+        self.backend.delete(*(email_key(email) for email in emails))
+
+    # 用户的 items 发生变化：删除用户数据，Email 索引仍然指向同一个 id
+    # 同时使 GET /users/{user_id} 缓存的响应失效
+    def invalidate_user(self, user_id: int):
+        self.backend.delete(user_key(user_id))
+        if self.response_cache is not None:
+            self.response_cache.invalidate(user_tag(user_id))
+
+
+def create_backend():
+    if settings.cache_backend == "redis":
+        if redis is None:
+            raise RuntimeError("cache_backend=redis requires: pip install redis")
+        client = redis.Redis.from_url(settings.redis_url)
+        return RedisCache(client, ttl=settings.cache_ttl)
+    if settings.cache_backend == "local-redis":
+        return RedisCache(LocalRedis(), ttl=settings.cache_ttl)
+    return LRUCache(maxsize=settings.cache_maxsize, ttl=settings.cache_ttl)
+
+
+# 缓存整个响应体并提供 ETag，使用与用户缓存相同类型的后端
+def create_response_backend():
+    if settings.cache_backend == "redis":
+        if redis is None:
+            raise RuntimeError("cache_backend=redis requires: pip install redis")
+        return RedisBackend(redis.Redis.from_url(settings.redis_url))
+    if settings.cache_backend == "local-redis":
+        return RedisBackend(LocalRedis())
+    return MemoryBackend(maxsize=settings.cache_maxsize)
+
+
+response_cache = ResponseCache(create_response_backend(), ttl=settings.cache_ttl)
+user_cache = UserCache(create_backend(), response_cache)
+
+
+# 带缓存的 crud.get_user / crud.get_user_by_email
+# 命中时返回 schemas.User，未命中时返回 ORM 实例，两者都可以作为 response_model=schemas.User 的返回值
+def get_user(db: Session, user_id: int):
+    user = user_cache.cached_user(user_id)
+    if user is not None:
+        return user
+    db_user = crud.get_user(db, user_id=user_id, load="joined")
+    if db_user is not None:
+        user_cache.store_user(db_user)
+    return db_user
+
+
+def get_user_by_email(db: Session, email: str):
+    user = user_cache.cached_user_by_email(email)
+    if user is not None:
+        return user
+    db_user = crud.get_user_by_email(db, email=email, load="joined")
+    if db_user is not None:
+        user_cache.store_user(db_user)
+    return db_user
+
+
+# 异步版本，供 async_main.py 使用
+async def get_user_async(db: AsyncSession, user_id: int):
+    user = user_cache.cached_user(user_id)
+    if user is not None:
+        return user
+    db_user = await async_crud.get_user(db, user_id=user_id, load="joined")
+    if db_user is not None:
+        user_cache.store_user(db_user)
+    return db_user
+
+
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    user = user_cache.cached_user_by_email(email)
+    if user is not None:
+        return user
+    db_user = await async_crud.get_user_by_email(db, email=email, load="joined")
+    if db_user is not None:
+        user_cache.store_user(db_user)
+    return db_user
@@ -3,25 +3,76 @@
 
 # 在这个文件中，我们将有可重用的函数来与数据库中的数据进行交互
 
-from sqlalchemy.orm import Session
+from typing import List, Optional, Set
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from . import models, schemas
 
+# 加载策略
+# models.User.items 默认是懒加载，序列化 100 个用户时每访问一次 user.items 就会多发一条 SELECT（N+1 问题）
+# 由路由按需选择预加载方式：
+# - selectin：先查用户，再用一条 WHERE owner_id IN (...) 查出这一页所有用户的 items，适合列表
+# - joined：用 LEFT OUTER JOIN 一次查出，适合读取单个用户
+# - lazy：不预加载，只需要用户本身的字段时使用
+LOADER_STRATEGIES = {
+    "lazy": None,
+    "selectin": selectinload,
+    "joined": joinedload,
+}
+
+
+def user_query(db: Session, load: str = "lazy"):
+    query = db.query(models.User)
+    loader = LOADER_STRATEGIES[load]
+    if loader is not None:
+        query = query.options(loader(models.User.items))
+    return query
+
 # 读取单个用户
-def get_user(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+def get_user(db: Session, user_id: int, load: str = "lazy"):
+    return user_query(db, load).filter(models.User.id == user_id).first()
 
 # 由 Email 查找用户
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+def get_user_by_email(db: Session, email: str, load: str = "lazy"):
+    return user_query(db, load).filter(models.User.email == email).first()
 
 # 读取多个用户
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+# 传入 after（上一页最后一个用户的 id）时使用游标分页，按 id 升序从索引处直接开始读取
+def get_users(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[int] = None,
+    load: str = "lazy",
+):
+    # 两种分页都按 id 排序：第一页按 skip/limit 取，返回的 X-Next-Cursor 要能接着用于游标分页
+    query = user_query(db, load).order_by(models.User.id)
+    if after is not None:
+        return query.filter(models.User.id > after).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+# 分批遍历全表，供流式导出使用
+# yield_per 让数据库驱动按批返回行，selectin 加载会对每一批单独执行一次 IN 查询
+def export_users_stmt(batch_size: int, load: str = "lazy"):
+    stmt = select(models.User).order_by(models.User.id)
+    loader = LOADER_STRATEGIES[load]
+    if loader is not None:
+        stmt = stmt.options(loader(models.User.items))
+    return stmt.execution_options(yield_per=batch_size)
+
+
+def iter_users(db: Session, batch_size: int = 1000, load: str = "lazy"):
+    stmt = export_users_stmt(batch_size, load)
+    return db.execute(stmt).scalars().partitions(batch_size)
+
+def fake_hash_password(password: str):
+    return password + "notreallyhashed"
 
 # 创建用户
 def create_user(db: Session, user: schemas.UserCreate):
-    fake_hashed_password = user.password + "notreallyhashed"
+    fake_hashed_password = fake_hash_password(user.password)
 
     # 创建实例
     db_user = models.User(email=user.email, hashed_password=fake_hashed_password)
@@ -31,8 +82,22 @@ def create_user(db: Session, user: schemas.UserCreate):
     return db_user
 
 # 获取全部 Item
-def get_items(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Item).offset(skip).limit(limit).all()
+def get_items(
+    db: Session, skip: int = 0, limit: int = 100, after: Optional[int] = None
+):
+    query = db.query(models.Item).order_by(models.Item.id)
+    if after is not None:
+        return query.filter(models.Item.id > after).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+def export_items_stmt(batch_size: int):
+    stmt = select(models.Item).order_by(models.Item.id)
+    return stmt.execution_options(yield_per=batch_size)
+
+
+def iter_items(db: Session, batch_size: int = 1000):
+    stmt = export_items_stmt(batch_size)
+    return db.execute(stmt).scalars().partitions(batch_size)
 
 # 创建用户与 Item 的绑定
 def create_user_item(db: Session, item: schemas.ItemCreate, user_id: int):
@@ -40,4 +105,116 @@ def create_user_item(db: Session, item: schemas.ItemCreate, user_id: int):
     db.add(db_item)
     db.commit()
     db.refresh(db_item)
-    return db_item
\ No newline at end of file
+    return db_item
+
+
+# 批量创建
+# 逐条调用 create_user 时每一行都是一次 add → commit → refresh，即一个事务加两次往返。
+# 批量接口把所有行放进一个事务：
+# - 支持 RETURNING 的数据库（PostgreSQL）用 INSERT ... VALUES (...), (...) RETURNING id 分批插入
+# - 其他数据库（SQLite）用 Core 的 insert 加参数列表，由驱动 executemany：一条预编译的语句执行所有行，
+#   再查回新行的 id：
+#   - 有唯一键（用户的 email）时按 WHERE key IN (...) 查回
+#   - 没有唯一键（item）时，SQLite 从第一条 INSERT 起到提交一直持有写锁，期间插入的行 id 连续，
+#     取插入后的 max(id) 往回数 len(rows) 个即可
+#   - 既没有 RETURNING 也不是 SQLite 时退回到 ORM 的 add_all + flush（每行一条 INSERT）
+# 最后再用 WHERE id IN (...) 一次性查回插入的行
+BULK_BATCH_SIZE = 500
+
+
+def chunked(values: list, size: int = BULK_BATCH_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def bulk_insert(
+    db: Session, model, rows: List[dict], key: Optional[str] = None
+) -> List[int]:
+    table = model.__table__
+    dialect = db.bind.dialect
+    if not rows:
+        return []
+    if dialect.full_returning:
+        ids = []
+        for chunk in chunked(rows):
+            result = db.execute(insert(table).values(chunk).returning(table.c.id))
+            ids.extend(result.scalars())
+    elif key is not None or dialect.name == "sqlite":
+        for chunk in chunked(rows):
+            db.execute(insert(table), chunk)
+        ids = inserted_ids(db, table, rows, key)
+    else:
+        objs = [model(**row) for row in rows]
+        db.add_all(objs)
+        db.flush()
+        ids = [obj.id for obj in objs]
+    db.commit()
+    return ids
+
+
+# 查回 executemany 插入的行的 id；拆成生成语句和处理结果两步，async_crud 共用
+def inserted_ids_stmts(table, rows: List[dict], key: Optional[str]):
+    if key is None:
+        return [select(func.max(table.c.id))]
+    column = table.c[key]
+    return [
+        select(table.c.id).filter(column.in_([row[key] for row in chunk]))
+        for chunk in chunked(rows)
+    ]
+
+
+def ids_from_results(results: list, rows: List[dict], key: Optional[str]) -> List[int]:
+    if key is None:
+        last = results[0][0]
+        return list(range(last - len(rows) + 1, last + 1))
+    return sorted(i for result in results for i in result)
+
+
+def inserted_ids(db: Session, table, rows: List[dict], key: Optional[str]) -> List[int]:
+    results = [
+        db.execute(stmt).scalars().all() for stmt in inserted_ids_stmts(table, rows, key)
+    ]
+    return ids_from_results(results, rows, key)
+
+
+# 一条查询找出已经注册过的 Email，代替逐条调用 get_user_by_email
+def get_existing_emails(db: Session, emails: List[str]) -> Set[str]:
+    existing = set()
+    for chunk in chunked(emails):
+        rows = db.query(models.User.email).filter(models.User.email.in_(chunk))
+        existing.update(email for (email,) in rows)
+    return existing
+
+
+# 请求体内部重复的 Email 加上数据库中已存在的 Email
+def find_duplicate_emails(users: List[schemas.UserCreate], existing: Set[str]):
+    seen = set()
+    duplicates = set(existing)
+    for user in users:
+        if user.email in seen:
+            duplicates.add(user.email)
+        seen.add(user.email)
+    return sorted(duplicates)
+
+
+def create_users(db: Session, users: List[schemas.UserCreate]):
+    rows = [
+        {"email": user.email, "hashed_password": fake_hash_password(user.password)}
+        for user in users
+    ]
+    ids = bulk_insert(db, models.User, rows, key="email")
+    result = []
+    for chunk in chunked(ids):
+        query = user_query(db, "selectin").filter(models.User.id.in_(chunk))
+        result.extend(query.order_by(models.User.id).all())
+    return result
+
+
+def create_user_items(db: Session, items: List[schemas.ItemCreate], user_id: int):
+    rows = [{**item.dict(), "owner_id": user_id} for item in items]
+    ids = bulk_insert(db, models.Item, rows)
+    result = []
+    for chunk in chunked(ids):
+        query = db.query(models.Item).filter(models.Item.id.in_(chunk))
+        result.extend(query.order_by(models.Item.id).all())
+    return result
@@ -0,0 +1,50 @@
+# 流式导出
+# read_users/read_items 会先把整页结果放进一个 List 再一次性序列化，导出全表时内存随表大小增长。
+# 导出接口改为：
+# 1. 数据库侧按 yield_per 分批取行，每次只持有一批 ORM 实例
+# 2. 每批序列化成一段文本后立即交给 StreamingResponse 发送
+# 这样内存占用只与批大小有关，第一批查出来就开始发送。
+
+# 支持两种格式：
+# - ndjson：每行一个 JSON 对象（application/x-ndjson），客户端可以逐行解析
+# - json：分块输出的 JSON 数组，兼容只认识普通 JSON 的客户端
+from typing import AsyncIterable, Iterable, Sequence
+
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def encode_batch(batch: Sequence, schema, export_format: str, first: bool) -> str:
+    rows = [schema.from_orm(row).json() for row in batch]
+    if export_format == "ndjson":
+        return "".join(row + "\n" for row in rows)
+    prefix = "" if first else ","
+    return prefix + ",".join(rows)
+
+
+def iter_export(batches: Iterable[Sequence], schema, export_format: str):
+    if export_format == "json":
+        yield "["
+    first = True
+    for batch in batches:
+        if batch:
+            yield encode_batch(batch, schema, export_format, first)
+            first = False
+    if export_format == "json":
+        yield "]"
+
+
+async def aiter_export(batches: AsyncIterable[Sequence], schema, export_format: str):
+    if export_format == "json":
+        yield "["
+    first = True
+    async for batch in batches:
+        if batch:
+            yield encode_batch(batch, schema, export_format, first)
+            first = False
+    if export_format == "json":
+        yield "]"
@@ -1,56 +1,162 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from . import crud, models, schemas
+from . import cache, crud, models, schemas
+from .compression import CompressionMiddleware
 from .database import SessionLocal, engine
+from .export import EXPORT_BATCH_SIZE, MEDIA_TYPES, iter_export
+from .pagination import get_after_id, next_cursor
+from .pool import ConnectionGate, pool_capacity, pool_metrics
 
 models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI()
 
+# 用户列表和导出的响应体较大，压缩后再发送，见 compression.py
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
 # 现在使用我们在 sql_app/databases.py 文件中创建的 SessionLocal 类来创建依赖项。
 # 我们需要每个请求有一个独立的数据库会话/连接（SessionLocal），在所有请求中使用同一个会话，然后在请求完成后关闭它。
+# 同时持有会话的请求数不超过连接池容量，原因见 pool.py 中的 ConnectionGate
+db_gate = ConnectionGate(pool_capacity())
+
+
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_db():
+    async with db_gate:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            # close 会归还连接（可能有网络往返），放到线程池中执行
+            await run_in_threadpool(db.close)
 
 
 @app.post("/users/", response_model=schemas.User)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = cache.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    db_user = crud.create_user(db=db, user=user)
+    cache.user_cache.invalidate_email(user.email)
+    return db_user
 
 
+# 游标分页：第一页不带 after 请求，之后把响应头 X-Next-Cursor 的值作为 after 传回即可
+# 不传 after 时仍然是原来的 skip/limit 分页
 @app.get("/users/", response_model=List[schemas.User])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = crud.get_users(db, skip=skip, limit=limit)
+def read_users(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = Depends(get_after_id),
+    db: Session = Depends(get_db),
+):
+    users = crud.get_users(db, skip=skip, limit=limit, after=after_id, load="selectin")
+    cursor = next_cursor(users, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
     return users
 
 
+# 流式导出全部用户，format=ndjson（默认）或 json
+# 要声明在 /users/{user_id} 之前，否则 export 会被当作 user_id 匹配
+@app.get("/users/export")
+def export_users(
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|json)$"),
+    db: Session = Depends(get_db),
+):
+    batches = crud.iter_users(db, batch_size=EXPORT_BATCH_SIZE, load="selectin")
+    return StreamingResponse(
+        iter_export(batches, schemas.User, export_format),
+        media_type=MEDIA_TYPES[export_format],
+    )
+
+
+# 响应缓存命中时不执行 read_user；If-None-Match 与 ETag 相同时返回 304
 @app.get("/users/{user_id}", response_model=schemas.User)
+@cache.response_cache.cached(tag="user:{user_id}")
 def read_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = crud.get_user(db, user_id=user_id)
+    db_user = cache.get_user(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 
+# 批量创建用户
+# 请求体中重复的 Email 和数据库中已存在的 Email 都会被拒绝，整批不会写入
+@app.post("/users/bulk", response_model=List[schemas.User])
+def create_users_bulk(users: List[schemas.UserCreate], db: Session = Depends(get_db)):
+    existing = crud.get_existing_emails(db, [user.email for user in users])
+    duplicates = crud.find_duplicate_emails(users, existing)
+    if duplicates:
+        raise HTTPException(
+            status_code=400,
+            detail={"msg": "Email already registered", "emails": duplicates},
+        )
+    db_users = crud.create_users(db=db, users=users)
+    cache.user_cache.invalidate_email(*(user.email for user in users))
+    return db_users
+
+
 @app.post("/users/{user_id}/items/", response_model=schemas.Item)
 def create_item_for_user(
     user_id: int, item: schemas.ItemCreate, db: Session = Depends(get_db)
 ):
-    return crud.create_user_item(db=db, item=item, user_id=user_id)
+    db_item = crud.create_user_item(db=db, item=item, user_id=user_id)
+    cache.user_cache.invalidate_user(user_id)
+    return db_item
+
+
+@app.post("/users/{user_id}/items/bulk", response_model=List[schemas.Item])
+def create_items_for_user_bulk(
+    user_id: int, items: List[schemas.ItemCreate], db: Session = Depends(get_db)
+):
+    db_items = crud.create_user_items(db=db, items=items, user_id=user_id)
+    cache.user_cache.invalidate_user(user_id)
+    return db_items
 
 
 @app.get("/items/", response_model=List[schemas.Item])
-def read_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    items = crud.get_items(db, skip=skip, limit=limit)
-    return items
\ No newline at end of file
+def read_items(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = Depends(get_after_id),
+    db: Session = Depends(get_db),
+):
+    items = crud.get_items(db, skip=skip, limit=limit, after=after_id)
+    cursor = next_cursor(items, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return items
+
+
+@app.get("/items/export")
+def export_items(
+    export_format: str = Query("ndjson", alias="format", regex="^(ndjson|json)$"),
+    db: Session = Depends(get_db),
+):
+    batches = crud.iter_items(db, batch_size=EXPORT_BATCH_SIZE)
+    return StreamingResponse(
+        iter_export(batches, schemas.Item, export_format),
+        media_type=MEDIA_TYPES[export_format],
+    )
+
+
+# 连接池状态与取连接的等待时间，用来判断连接池是否成为瓶颈
+@app.get("/metrics/pool")
+def read_pool_metrics():
+    return pool_metrics(engine, db_gate)
+
+
+@app.get("/metrics/cache")
+def read_cache_metrics():
+    return {
+        "users": cache.user_cache.stats.snapshot(),
+        "responses": cache.response_cache.stats.snapshot(),
+    }
@@ -0,0 +1,48 @@
+# 游标（keyset）分页
+# .offset(skip) 会让数据库先扫描再丢弃前 skip 行，页数越深越慢。
+# 游标分页记住上一页最后一行的 id，下一页直接用 WHERE id > :after 走主键索引，
+# 因此第 1 页和第 10000 页的代价是一样的。
+
+# 对外暴露的游标是不透明的字符串，客户端只需要原样传回，不应该自己拼接。
+import base64
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = f"id:{last_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        prefix, value = raw.split(":", 1)
+        if prefix != "id":
+            raise InvalidCursor(cursor)
+        return int(value)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+
+
+# 本页取满 limit 行时才可能还有下一页，此时返回最后一行对应的游标
+def next_cursor(rows, limit: int) -> Optional[str]:
+    if rows and len(rows) == limit:
+        return encode_cursor(rows[-1].id)
+    return None
+
+
+# 依赖项：把查询参数 after 解码为 id，游标无效时返回 400
+def get_after_id(after: Optional[str] = None):
+    if after is None:
+        return None
+    try:
+        return decode_cursor(after)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,148 @@
+# 连接池配置与 SQLite 调优
+
+# create_engine 只传 check_same_thread=False 时：
+# - SQLAlchemy 1.4 对 SQLite 文件数据库默认使用 NullPool，每次都新建连接，连接池参数不起作用
+# - SQLite 使用回滚日志（rollback journal）模式，写事务会阻塞所有读，并发写入只能排队
+# 这里显式使用 QueuePool，并在每个新连接上设置 PRAGMA：
+# - journal_mode=WAL：读写互不阻塞
+# - synchronous=NORMAL：WAL 模式下只在检查点 fsync，安全性足够且写入快很多
+# - mmap_size：用内存映射读取数据库文件，减少 read 系统调用
+import asyncio
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .config import settings
+
+
+# 连接池等待时间统计
+# 如果 wait_max / wait_total 持续增长，或者出现 timeouts，说明请求在排队等连接，连接池就是瓶颈
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            checkouts = self.checkouts
+            return {
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "wait_total_ms": self.wait_total * 1000,
+                "wait_avg_ms": self.wait_total / checkouts * 1000 if checkouts else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+
+# _do_get 是 QueuePool 从队列里取连接（必要时等待）的地方，在这里计时
+class TimedPoolMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return conn
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# 同步路由的连接闸门
+# 同步路由在线程池里取连接，而 response_model 的校验/序列化同样要占用一个线程池线程，此时连接还没有归还。
+# 并发请求数超过「线程数 + 连接数」时，所有线程都在等连接、持有连接的请求又在等线程，只能等到 pool_timeout 报错。
+# 因此在事件循环中先用信号量限制同时持有会话的请求数不超过连接池容量，排队发生在事件循环里，不占用线程。
+class ConnectionGate:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.metrics = PoolMetrics()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.capacity)
+        start = time.perf_counter()
+        await self._semaphore.acquire()
+        self.metrics.record(time.perf_counter() - start)
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._semaphore.release()
+
+
+def pool_capacity() -> int:
+    return settings.pool_size + max(settings.max_overflow, 0)
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url: str, poolclass) -> dict:
+    options = {
+        "poolclass": poolclass,
+        "pool_size": settings.pool_size,
+        "max_overflow": settings.max_overflow,
+        "pool_timeout": settings.pool_timeout,
+        "pool_recycle": settings.pool_recycle,
+        "pool_pre_ping": settings.pool_pre_ping,
+    }
+    # check_same_thread 只有 SQLite 需要
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+    cursor.close()
+
+
+def configure_engine(sync_engine, url: str):
+    if is_sqlite(url):
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+
+
+def pool_metrics(sync_engine, gate: Optional[ConnectionGate] = None) -> dict:
+    pool = sync_engine.pool
+    result = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        result["checkout"] = metrics.snapshot()
+    if gate is not None:
+        result["gate"] = gate.metrics.snapshot()
+    return result
@@ -0,0 +1,33 @@
+# 查询计数器
+# 通过 SQLAlchemy 的 before_cursor_execute 事件统计一段代码里实际发出了多少条 SQL，
+# 测试里可以用它断言某个路由的查询数量不随返回行数增长，例如：
+
+#     with count_queries(engine) as counter:
+#         client.get("/users/?limit=100")
+#     assert counter.count == 2
+
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements: List[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: Engine):
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
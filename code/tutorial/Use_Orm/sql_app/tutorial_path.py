@@ -0,0 +1,10 @@
+# response_cache.py、compression.py 等公共模块在 tutorial 目录下，只保留一份。
+# 从 Use_Orm、Bigger_Applications 目录运行时 tutorial 目录不在 sys.path 上，这里把它加到最后，
+# 不会遮住包内和已安装的同名模块，运行时也不需要再设置 PYTHONPATH。
+import os
+import sys
+
+TUTORIAL_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if TUTORIAL_DIR not in sys.path:
+    sys.path.append(TUTORIAL_DIR)
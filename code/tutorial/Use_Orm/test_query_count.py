@@ -0,0 +1,65 @@
+# 查询数量测试
+# 运行：在 Use_Orm 目录下执行 pytest test_query_count.py
+# 用 query_counter.py 的 count_queries 统计 GET /users/ 发出的 SQL 条数：
+# 一条查用户，一条 selectin 查这一页所有用户的 items，共 2 条，与返回多少用户无关。
+# 如果有人把预加载去掉（退回懒加载），序列化每个用户时都会多一条 SELECT，这里就会失败。
+import os
+import tempfile
+
+# 必须在导入 sql_app 之前设置，测试使用临时数据库，不修改 sql_app.db
+DB_DIR = tempfile.mkdtemp()
+os.environ["SQL_APP_DATABASE_URL"] = f"sqlite:///{DB_DIR}/test.db"
+os.environ["SQL_APP_ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_DIR}/test.db"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from sql_app import crud, schemas
+from sql_app.database import SessionLocal, engine
+from sql_app.main import app
+from sql_app.query_counter import count_queries
+
+client = TestClient(app)
+
+
+def seed_users(count: int, items_per_user: int = 3):
+    db = SessionLocal()
+    try:
+        users = [
+            schemas.UserCreate(email=f"user{i}@example.com", password="secret")
+            for i in range(count)
+        ]
+        for user in crud.create_users(db, users):
+            items = [
+                schemas.ItemCreate(title=f"item {n}", description=None)
+                for n in range(items_per_user)
+            ]
+            crud.create_user_items(db, items, user_id=user.id)
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def users():
+    seed_users(150)
+
+
+@pytest.mark.parametrize("limit", [1, 10, 100])
+def test_read_users_query_count(limit):
+    with count_queries(engine) as counter:
+        response = client.get(f"/users/?limit={limit}")
+    assert response.status_code == 200
+    assert len(response.json()) == limit
+    assert all(len(user["items"]) == 3 for user in response.json())
+    assert counter.count == 2, counter.statements
+
+
+def test_read_users_cursor_query_count():
+    first = client.get("/users/?limit=100")
+    with count_queries(engine) as counter:
+        response = client.get(
+            "/users/", params={"limit": 100, "after": first.headers["X-Next-Cursor"]}
+        )
+    assert response.status_code == 200
+    assert len(response.json()) == 50
+    assert counter.count == 2, counter.statements
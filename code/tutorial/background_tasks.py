@@ -19,11 +19,17 @@ async def send_notification(email: str, background_tasks: BackgroundTasks):
 
 # 依赖注入
 # 使用 BackgroundTasks 也可以与依赖注入系统一起使用，您可以在多个级别声明 BackgroundTasks 类型的参数：在路径操作函数中、在依赖项中（可靠的）、在子依赖项中等。
+import os
 from typing import Optional
 from fastapi import Depends
+from log_sink import BufferedLogSink
+
+# write_log 不再每次打开文件，只是把消息追加到内存缓冲区，由 log_sink 的后台线程批量写入 log.txt
+log_sink = BufferedLogSink("log.txt")
+
+
 def write_log(message: str):
-    with open("log.txt", mode="a") as log:
-        log.write(message)
+    log_sink.write(message)
 
 
 def get_query(background_tasks: BackgroundTasks, q: Optional[str] = None):
@@ -39,4 +45,59 @@ async def send_notification(
 ):
     message = f"message to {email}\n"
     background_tasks.add_task(write_log, message)
-    return {"message": "Message sent"}
\ No newline at end of file
+    return {"message": "Message sent"}
+
+# 持久化的后台任务
+# BackgroundTasks 的任务保存在内存中，进程重启就会丢失。
+# 需要保证执行的任务可以写进 job_queue 的 SQLite 队列，由单独的 worker 进程执行，失败会自动重试：
+#     python job_queue.py background_tasks
+# 任务函数需要先注册，参数必须能被 JSON 序列化。
+from job_queue import JobQueue, JobTasks, register
+
+register(write_notification)
+
+
+# 任务函数返回后 worker 就会把任务确认为完成并从队列中删除。
+# write_log 只是把消息放进 log_sink 的缓冲区，返回时还没有写入文件，缓冲区满时还可能被丢弃，
+# 所以持久化的任务直接写文件，并在返回之前 fsync
+@register(name="write_log")
+def write_log_durable(message: str):
+    with open("log.txt", mode="a") as log_file:
+        log_file.write(message)
+        log_file.flush()
+        os.fsync(log_file.fileno())
+
+# 数据库文件的位置由环境变量 JOBS_DB 指定，默认是当前目录下的 jobs.db
+job_queue = JobQueue()
+
+
+def get_job_tasks():
+    return JobTasks(job_queue)
+
+
+def get_durable_query(tasks: JobTasks = Depends(get_job_tasks), q: Optional[str] = None):
+    if q:
+        tasks.add_task(write_log_durable, f"found query: {q}\n")
+    return q
+
+
+# 用法与 BackgroundTasks 相同，只是把参数类型换成 JobTasks
+# 入队是阻塞的 SQLite 写入，所以用 def 声明，放进线程池执行，不阻塞事件循环
+@app.post("/jobs/send-notification/{email}")
+def send_durable_notification(
+    email: str,
+    tasks: JobTasks = Depends(get_job_tasks),
+    q: str = Depends(get_durable_query),
+):
+    tasks.add_task(write_log_durable, f"message to {email}\n")
+    return {"message": "Message queued"}
+
+
+@app.on_event("shutdown")
+def close_log_sink():
+    log_sink.close()
+
+
+@app.get("/jobs/stats")
+async def read_job_stats():
+    return job_queue.stats()
@@ -0,0 +1,62 @@
+# 比较不同编码、不同压缩级别的 CPU 时间和压缩后的大小，用来选择 CompressionMiddleware 的 levels
+# 测试数据是 read_users/read_items 风格的 JSON 列表
+# 在 tutorial 目录下运行：python bench_compression.py
+import json
+import time
+
+from compression import COMPRESSORS, compress
+
+SIZES = [10, 100, 1000]
+LEVELS = {
+    "gzip": [1, 4, 6, 9],
+    "br": [1, 4, 6, 9, 11],
+    "zstd": [1, 3, 6, 12, 19],
+}
+
+
+def make_payload(rows: int) -> bytes:
+    users = [
+        {
+            "id": i,
+            "email": f"user{i}@example.com",
+            "is_active": i % 3 != 0,
+            "items": [
+                {"id": i * 10 + j, "title": f"Item {j} of user {i}", "description": None}
+                for j in range(3)
+            ],
+        }
+        for i in range(rows)
+    ]
+    return json.dumps(users).encode()
+
+
+def measure(encoding: str, level: int, data: bytes) -> tuple:
+    # 每个组合至少跑 0.2 秒，取平均
+    count = 0
+    start = time.perf_counter()
+    while True:
+        body = compress(encoding, level, data)
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed > 0.2:
+            return elapsed / count, len(body)
+
+
+def main():
+    print(f"{'rows':>5} {'raw':>8} {'encoding':<8} {'level':>5} {'bytes':>8} {'ratio':>6} {'µs':>9} {'MB/s':>7}")
+    for rows in SIZES:
+        data = make_payload(rows)
+        for encoding, levels in LEVELS.items():
+            if encoding not in COMPRESSORS:
+                print(f"{rows:>5} {len(data):>8} {encoding:<8} not installed")
+                continue
+            for level in levels:
+                seconds, size = measure(encoding, level, data)
+                print(
+                    f"{rows:>5} {len(data):>8} {encoding:<8} {level:>5} {size:>8} "
+                    f"{len(data) / size:>6.1f} {seconds * 1e6:>9.0f} {len(data) / seconds / 1e6:>7.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# 对比 CORSMiddleware 与 CachedCORSMiddleware 处理预检请求和普通跨域请求的吞吐量
+# 直接调用中间件的 ASGI 接口，被包装的应用只返回一个空响应
+# 在 tutorial 目录下运行：python bench_cors.py
+import asyncio
+import time
+
+from starlette.middleware.cors import CORSMiddleware
+
+from fast_cors import CachedCORSMiddleware
+
+REQUESTS = 50_000
+# 源列表较长时，CORSMiddleware 逐个比较的开销更明显
+ORIGINS = [f"https://app{i}.example.com" for i in range(50)] + ["http://localhost:8080"]
+OPTIONS = dict(
+    allow_origins=ORIGINS,
+    allow_origin_regex=r"https://.*\.preview\.example\.org",
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    max_age=86400,
+)
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def make_scope(method: str, headers: dict) -> dict:
+    return {
+        "type": "http",
+        "method": method,
+        "path": "/",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+CASES = {
+    "preflight": make_scope(
+        "OPTIONS",
+        {
+            "origin": "http://localhost:8080",
+            "access-control-request-method": "PUT",
+            "access-control-request-headers": "content-type, x-token",
+        },
+    ),
+    "preflight regex": make_scope(
+        "OPTIONS",
+        {"origin": "https://pr-42.preview.example.org", "access-control-request-method": "POST"},
+    ),
+    "simple GET": make_scope("GET", {"origin": "http://localhost:8080"}),
+}
+
+
+async def run(middleware, scope) -> float:
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await middleware(scope, receive, send)
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def main():
+    variants = {
+        "CORSMiddleware": CORSMiddleware(app, **OPTIONS),
+        "CachedCORSMiddleware": CachedCORSMiddleware(app, **OPTIONS),
+    }
+    print(f"{'case':<16} {'variant':<22} {'req/s':>10}")
+    for case, scope in CASES.items():
+        for name, middleware in variants.items():
+            print(f"{case:<16} {name:<22} {asyncio.run(run(middleware, scope)):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
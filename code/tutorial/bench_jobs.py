@@ -0,0 +1,67 @@
+# 测量任务队列的入队延迟和 worker 的吞吐量
+# 在 tutorial 目录下运行：python bench_jobs.py
+import os
+import statistics
+import tempfile
+import time
+
+from job_queue import JobQueue, Worker, register
+
+ENQUEUE_COUNT = 5_000
+DRAIN_COUNT = 20_000
+CONCURRENCY = [1, 4, 8]
+BATCH_SIZES = [1, 10, 100]
+
+
+@register
+def noop(message: str):
+    pass
+
+
+def percentile(samples, p: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def bench_enqueue(path: str):
+    queue = JobQueue(path)
+    samples = []
+    for i in range(ENQUEUE_COUNT):
+        start = time.perf_counter_ns()
+        queue.enqueue(noop, f"message {i}")
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    samples.sort()
+    print(
+        f"enqueue: p50 {statistics.median(samples):.1f} us, "
+        f"p99 {percentile(samples, 0.99):.1f} us"
+    )
+
+    start = time.perf_counter()
+    queue.enqueue_many([(noop, (f"message {i}",), {}) for i in range(ENQUEUE_COUNT)])
+    elapsed = (time.perf_counter() - start) / ENQUEUE_COUNT * 1_000_000
+    print(f"enqueue_many: {elapsed:.1f} us/job")
+    queue.close()
+
+
+def bench_drain(path: str):
+    print(f"{'concurrency':>11} {'batch':>6} {'jobs/s':>10}")
+    for concurrency in CONCURRENCY:
+        for batch_size in BATCH_SIZES:
+            queue = JobQueue(path)
+            queue.enqueue_many([(noop, (f"message {i}",), {}) for i in range(DRAIN_COUNT)])
+            worker = Worker(queue, concurrency=concurrency, batch_size=batch_size)
+            start = time.perf_counter()
+            drained = worker.drain()
+            rate = drained / (time.perf_counter() - start)
+            print(f"{concurrency:>11} {batch_size:>6} {rate:>10.0f}")
+            worker.executor.shutdown()
+            queue.close()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        bench_enqueue(os.path.join(directory, "enqueue.db"))
+        bench_drain(os.path.join(directory, "drain.db"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# 对比每条日志 open/write/close 与 BufferedLogSink 的写入速度
+# 多个线程同时写，模拟线程池里执行的 BackgroundTasks
+# 在 tutorial 目录下运行：python bench_log_sink.py
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from log_sink import BufferedLogSink
+
+MESSAGES = 100_000
+THREADS = 8
+
+
+def open_per_call(path: str):
+    def write_log(message: str):
+        with open(path, mode="a") as log:
+            log.write(message)
+
+    return write_log
+
+
+def run(write_log) -> float:
+    per_thread = MESSAGES // THREADS
+
+    def worker(n: int):
+        for i in range(per_thread):
+            write_log(f"message {n}-{i}\n")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as executor:
+        list(executor.map(worker, range(THREADS)))
+    return (time.perf_counter() - start) / (per_thread * THREADS) * 1_000_000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'writer':<20} {'us/message':>10}")
+        path = os.path.join(directory, "open.txt")
+        print(f"{'open per call':<20} {run(open_per_call(path)):>10.2f}")
+
+        for fsync in ("never", "interval", "flush"):
+            path = os.path.join(directory, f"sink-{fsync}.txt")
+            sink = BufferedLogSink(path, fsync=fsync)
+            elapsed = run(sink.write)
+            sink.close()
+            with open(path) as f:
+                assert sum(1 for _ in f) == MESSAGES
+            print(f"{'sink fsync=' + fsync:<20} {elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
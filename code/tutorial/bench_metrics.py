@@ -0,0 +1,49 @@
+# 测量 MetricsMiddleware 自身的开销
+# 用一个什么都不做的 ASGI 应用代替 FastAPI，直接调用中间件，排除路由和序列化的耗时
+# 在 tutorial 目录下运行：python bench_metrics.py
+import asyncio
+import time
+
+from middleware import MetricsMiddleware, MetricsRegistry
+
+REQUESTS = 200_000
+
+
+class FakeRoute:
+    path = "/users/{user_id}"
+
+
+async def hello_app(scope, receive, send):
+    scope["route"] = FakeRoute
+    await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b'{"message":"Hello World"}'})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def run(app) -> float:
+    start = time.perf_counter_ns()
+    for i in range(REQUESTS):
+        scope = {"type": "http", "method": "GET", "path": f"/users/{i}"}
+        await app(scope, receive, send)
+    return (time.perf_counter_ns() - start) / REQUESTS
+
+
+def main():
+    registry = MetricsRegistry()
+    bare = asyncio.run(run(hello_app))
+    wrapped = asyncio.run(run(MetricsMiddleware(hello_app, registry)))
+    print(f"{'without middleware':<20} {bare:>8.0f} ns/request")
+    print(f"{'with middleware':<20} {wrapped:>8.0f} ns/request")
+    print(f"{'overhead':<20} {wrapped - bare:>8.0f} ns/request")
+
+
+if __name__ == "__main__":
+    main()
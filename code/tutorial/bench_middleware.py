@@ -0,0 +1,85 @@
+# 对比 @app.middleware("http")（BaseHTTPMiddleware）与纯 ASGI 中间件的吞吐量
+# 被测应用是一个只有 hello world 路由 GET / 的空白 app，直接调用 ASGI 接口，不经过网络和服务器
+# 在 tutorial 目录下运行：python bench_middleware.py
+import asyncio
+import time
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware import ProcessTimeMiddleware, add_process_time_header
+
+REQUESTS = 20_000
+CONCURRENCY = 10
+
+# 不使用 main.py 的 app：它已经加了压缩中间件，不能作为「没有中间件」的基准
+hello_app = FastAPI()
+
+
+@hello_app.get("/")
+async def root():
+    return {"message": "Hello World"}
+
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/",
+    "raw_path": b"/",
+    "root_path": "",
+    "query_string": b"",
+    "headers": [(b"host", b"testserver")],
+    "client": ("127.0.0.1", 12345),
+    "server": ("testserver", 80),
+}
+
+
+# 和真实服务器一样：第一次返回请求体，之后一直等待直到连接断开
+# BaseHTTPMiddleware 会在后台持续调用 receive 监听断开，不能每次都立即返回
+def make_receive():
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    return receive
+
+
+async def send(message):
+    pass
+
+
+async def worker(app, count: int):
+    for _ in range(count):
+        await app(dict(SCOPE), make_receive(), send)
+
+
+async def run(app) -> float:
+    # 预热一次，让 FastAPI 构建好中间件栈
+    await app(dict(SCOPE), make_receive(), send)
+    per_worker = REQUESTS // CONCURRENCY
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(app, per_worker) for _ in range(CONCURRENCY)))
+    return per_worker * CONCURRENCY / (time.perf_counter() - start)
+
+
+def main():
+    variants = {
+        "no middleware": hello_app,
+        "@app.middleware": BaseHTTPMiddleware(hello_app, dispatch=add_process_time_header),
+        "pure ASGI": ProcessTimeMiddleware(hello_app),
+    }
+    print(f"{'variant':<16} {'req/s':>10}")
+    for name, app in variants.items():
+        print(f"{name:<16} {asyncio.run(run(app)):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
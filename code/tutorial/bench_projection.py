@@ -0,0 +1,60 @@
+# 测量 response_model 的校验 + 过滤开销，以及 @trusted_response 预编译投影省下的部分
+# 对 response_model.py 中的路由分别执行：
+# - default：FastAPI 的 serialize_response（校验 → jsonable_encoder）
+# - fast：快速模式的 to_content（校验 → model.dict()）
+# - trusted：编译好的 ProjectionPlan.apply（只挑选字段）
+# 在 tutorial 目录下运行：python bench_projection.py
+import asyncio
+import time
+
+from fastapi.routing import serialize_response
+
+from fast_json import ProjectionPlan, to_content
+from response_model import app, items
+
+REPEAT = 20_000
+CASES = [
+    ("/items/{item_id}", "bar"),
+    ("/items/{item_id}/name", "bar"),
+    ("/items/{item_id}/public", "bar"),
+]
+
+
+def timed(fn) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter_ns() - start) / REPEAT / 1000
+
+
+def main():
+    routes = {route.path: route for route in app.routes}
+    loop = asyncio.new_event_loop()
+    print(f"{'route':<26} {'default(us)':>12} {'fast(us)':>10} {'trusted(us)':>12}")
+    for path, item_id in CASES:
+        route = routes[path]
+        raw = items[item_id]
+        plan = ProjectionPlan.compile(route)
+        assert plan.apply(raw) == to_content(route, raw)
+
+        async def default():
+            return await serialize_response(
+                field=route.response_field,
+                response_content=raw,
+                include=route.response_model_include,
+                exclude=route.response_model_exclude,
+                by_alias=route.response_model_by_alias,
+                exclude_unset=route.response_model_exclude_unset,
+            )
+
+        # serialize_response 是协程，减去 run_until_complete 本身的开销
+        overhead_us = timed(lambda: loop.run_until_complete(asyncio.sleep(0)))
+        default_us = timed(lambda: loop.run_until_complete(default())) - overhead_us
+        fast_us = timed(lambda: to_content(route, raw))
+        trusted_us = timed(lambda: plan.apply(raw))
+        print(f"{path:<26} {default_us:>12.2f} {fast_us:>10.2f} {trusted_us:>12.2f}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
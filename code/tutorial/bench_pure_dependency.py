@@ -0,0 +1,82 @@
+# 对比普通依赖项与 @pure 依赖项的吞吐量（异步和同步各一个）
+# 直接调用 ASGI 接口，不经过网络和服务器
+# 在 tutorial 目录下运行：python bench_pure_dependency.py
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import Depends, FastAPI
+
+from pure_dependency import pure
+
+REQUESTS = 20_000
+CONCURRENCY = 10
+
+
+async def common_parameters(q: Optional[str] = None, skip: int = 0, limit: int = 100):
+    return {"q": q, "skip": skip, "limit": limit}
+
+
+# 同步的依赖项每次都要放进线程池执行
+def sync_parameters(q: Optional[str] = None, skip: int = 0, limit: int = 100):
+    return {"q": q, "skip": skip, "limit": limit}
+
+
+def make_app(dependency) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/")
+    async def read_items(commons: dict = Depends(dependency)):
+        return commons
+
+    return app
+
+
+SCOPE = {
+    "type": "http",
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/items/",
+    "raw_path": b"/items/",
+    "root_path": "",
+    "query_string": b"q=foo&skip=10&limit=20",
+    "headers": [(b"host", b"testserver")],
+}
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def run(app) -> float:
+    per_worker = REQUESTS // CONCURRENCY
+
+    async def worker():
+        for _ in range(per_worker):
+            await app(dict(SCOPE), receive, send)
+
+    await app(dict(SCOPE), receive, send)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return per_worker * CONCURRENCY / (time.perf_counter() - start)
+
+
+def main():
+    variants = {
+        "async": make_app(common_parameters),
+        "async @pure": make_app(pure(common_parameters)),
+        "sync": make_app(sync_parameters),
+        "sync @pure": make_app(pure(sync_parameters)),
+    }
+    print(f"{'dependency':<12} {'req/s':>10}")
+    for name, app in variants.items():
+        print(f"{name:<12} {asyncio.run(run(app)):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# 可续传上传的客户端示例与吞吐量测试
+# 1. 上传一部分分块后“断线”，通过 HEAD 的 Upload-Ranges 找出缺少的分块继续上传
+# 2. 用不同的并行度上传同一个文件，比较吞吐量
+# 应用在进程内通过 ASGI 调用，不经过网络，并行带来的收益主要体现在真实网络的往返延迟上
+# 在 tutorial 目录下运行：python bench_resumable.py
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+
+import httpx
+
+import resumable_upload
+from form_and_file import app
+
+FILE_SIZE = 64 * 1024 * 1024
+CHUNK_SIZE = 4 * 1024 * 1024
+CONCURRENCY = [1, 4, 8]
+
+
+def missing_chunks(size: int, ranges_header: str):
+    received = []
+    for value in filter(None, ranges_header.split(",")):
+        start, end = (int(x) for x in value.split("-"))
+        received.append((start, end))
+    for offset in range(0, size, CHUNK_SIZE):
+        end = min(offset + CHUNK_SIZE, size)
+        if not any(start <= offset and end <= stop for start, stop in received):
+            yield offset, end
+
+
+async def upload(client: httpx.AsyncClient, data: bytes, concurrency: int, limit: int = None):
+    response = await client.post("/uploads/", json={"filename": "big.bin", "size": len(data)})
+    upload_id = response.json()["upload_id"]
+    await send_chunks(client, upload_id, data, concurrency, limit)
+    return upload_id
+
+
+async def send_chunks(client, upload_id: str, data: bytes, concurrency: int, limit: int = None):
+    head = await client.head(f"/uploads/{upload_id}")
+    chunks = list(missing_chunks(len(data), head.headers["Upload-Ranges"]))[:limit]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(offset: int, end: int):
+        async with semaphore:
+            response = await client.patch(
+                f"/uploads/{upload_id}",
+                content=data[offset:end],
+                headers={"Upload-Offset": str(offset)},
+            )
+            response.raise_for_status()
+
+    await asyncio.gather(*(send(offset, end) for offset, end in chunks))
+
+
+async def main():
+    data = os.urandom(FILE_SIZE)
+    expected = hashlib.sha256(data).hexdigest()
+    async with httpx.AsyncClient(app=app, base_url="http://testserver") as client:
+        # 断点续传：先只传一半分块，再根据 HEAD 的结果补传
+        upload_id = await upload(client, data, concurrency=4, limit=FILE_SIZE // CHUNK_SIZE // 2)
+        head = await client.head(f"/uploads/{upload_id}")
+        print(f"after interruption: Upload-Offset={head.headers['Upload-Offset']}")
+        response = await client.post(f"/uploads/{upload_id}/finalize")
+        assert response.status_code == 409
+        await send_chunks(client, upload_id, data, concurrency=4)
+        response = await client.post(f"/uploads/{upload_id}/finalize")
+        stored = os.path.join(resumable_upload.UPLOAD_DIR, upload_id)
+        with open(stored, "rb") as f:
+            assert hashlib.sha256(f.read()).hexdigest() == expected
+        print("resumed upload verified")
+
+        print(f"{'concurrency':>11} {'MB/s':>8}")
+        for concurrency in CONCURRENCY:
+            start = time.perf_counter()
+            upload_id = await upload(client, data, concurrency)
+            response = await client.post(f"/uploads/{upload_id}/finalize")
+            response.raise_for_status()
+            elapsed = time.perf_counter() - start
+            print(f"{concurrency:>11} {FILE_SIZE / 1024 ** 2 / elapsed:>8.0f}")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        asyncio.run(main())
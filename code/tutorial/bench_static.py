@@ -0,0 +1,91 @@
+# 对比 StaticFiles 与 CachedStaticFiles 的吞吐量
+# 在临时目录里生成测试文件，直接调用 ASGI 接口，不经过网络和服务器
+# 在 tutorial 目录下运行：python bench_static.py
+import asyncio
+import gzip
+import os
+import tempfile
+import time
+
+from starlette.staticfiles import StaticFiles
+
+from fast_static import CachedStaticFiles
+
+REQUESTS = 5_000
+CONCURRENCY = 10
+# (文件名, 大小, Accept-Encoding)
+CASES = [
+    ("app.js", 100 * 1024, ""),
+    ("app.js", 100 * 1024, "br, gzip"),
+    ("video.bin", 16 * 1024 * 1024, ""),
+]
+
+
+def make_scope(path: str, accept_encoding: str) -> dict:
+    headers = [(b"host", b"testserver")]
+    if accept_encoding:
+        headers.append((b"accept-encoding", accept_encoding.encode()))
+    return {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/" + path,
+        "raw_path": b"/" + path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def make_send(counter: list):
+    async def send(message):
+        if message["type"] == "http.response.body":
+            counter[0] += len(message["body"])
+
+    return send
+
+
+async def run(app, path: str, accept_encoding: str, requests: int):
+    counter = [0]
+    send = make_send(counter)
+    per_worker = requests // CONCURRENCY
+
+    async def worker():
+        for _ in range(per_worker):
+            await app(make_scope(path, accept_encoding), receive, send)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    return per_worker * CONCURRENCY / elapsed, counter[0] / per_worker / CONCURRENCY
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        source = ("console.log('hello');\n" * 5000).encode()[: 100 * 1024]
+        with open(os.path.join(directory, "app.js"), "wb") as f:
+            f.write(source)
+        with open(os.path.join(directory, "app.js.gz"), "wb") as f:
+            f.write(gzip.compress(source, 9))
+        with open(os.path.join(directory, "video.bin"), "wb") as f:
+            f.write(os.urandom(16 * 1024 * 1024))
+
+        variants = {
+            "StaticFiles": StaticFiles(directory=directory),
+            "CachedStaticFiles": CachedStaticFiles(directory=directory),
+        }
+        print(f"{'variant':<18} {'file':<10} {'accept-encoding':<16} {'req/s':>8} {'bytes/resp':>11}")
+        for path, size, accept_encoding in CASES:
+            requests = REQUESTS if size < 1024 * 1024 else REQUESTS // 50
+            for name, app in variants.items():
+                rate, sent = asyncio.run(run(app, path, accept_encoding, requests))
+                print(f"{name:<18} {path:<10} {accept_encoding or '-':<16} {rate:>8.0f} {sent:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# 对比 bytes = File(...) 与流式上传的内存峰值和吞吐量
+# 直接调用 ASGI 接口，请求体按 64 KB 一块生成，不会先在内存里拼出整个请求
+# 在 tutorial 目录下运行：python bench_upload.py
+import asyncio
+import time
+import tracemalloc
+
+from form_and_file import app
+
+CHUNK_SIZE = 64 * 1024
+BOUNDARY = b"benchboundary"
+CASES = [
+    ("/files/", "file", 256),
+    ("/stream/digest/", "file", 256),
+    ("/stream/digest/", "file", 2048),
+]
+
+
+def make_receive(field: str, size_mb: int):
+    head = (
+        b"--" + BOUNDARY + b"\r\n"
+        b'Content-Disposition: form-data; name="' + field.encode() + b'"; filename="big.bin"\r\n'
+        b"Content-Type: application/octet-stream\r\n\r\n"
+    )
+    tail = b"\r\n--" + BOUNDARY + b"--\r\n"
+    chunk = b"x" * CHUNK_SIZE
+    remaining = size_mb * 1024 * 1024 // CHUNK_SIZE
+    state = {"head": True}
+
+    async def receive():
+        nonlocal remaining
+        if state["head"]:
+            state["head"] = False
+            return {"type": "http.request", "body": head, "more_body": True}
+        if remaining:
+            remaining -= 1
+            return {"type": "http.request", "body": chunk, "more_body": True}
+        return {"type": "http.request", "body": tail, "more_body": False}
+
+    return receive
+
+
+async def upload(path: str, field: str, size_mb: int) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=" + BOUNDARY)],
+        "client": ("127.0.0.1", 12345),
+        "server": ("testserver", 80),
+    }
+    status = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    await app(scope, make_receive(field, size_mb), send)
+    return status["code"]
+
+
+def main():
+    print(f"{'route':<16} {'size(MB)':>9} {'peak(MB)':>9} {'MB/s':>8}")
+    for path, field, size_mb in CASES:
+        tracemalloc.start()
+        start = time.perf_counter()
+        code = asyncio.run(upload(path, field, size_mb))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert code == 200, code
+        print(f"{path:<16} {size_mb:>9} {peak / 1024 ** 2:>9.1f} {size_mb / elapsed:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# 响应压缩
+# Starlette 自带的 GZipMiddleware 只支持 gzip，压缩级别固定，所有类型的响应都压缩
+# （图片、zip 等已经压缩过的内容再压一遍只会浪费 CPU）。
+
+# CompressionMiddleware 是纯 ASGI 中间件：
+
+#     app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+# - 根据请求头 Accept-Encoding 选择编码，服务器端的优先顺序为 zstd、br、gzip，
+#   brotli/zstandard 没有安装时自动跳过，客户端 q=0 的编码不使用
+# - 响应体小于 minimum_size 时不压缩：压缩头部的开销可能比省下的还多
+# - 只压缩 content_types 中列出的类型（按前缀匹配，忽略 ; charset=... 参数）
+# - 响应已经带有 Content-Encoding，或者是 206/204/304 时原样发送
+# - StreamingResponse 等分多次发送的响应逐块压缩，每一块压缩后立即 flush 发送出去，
+#   客户端不需要等到整个响应结束才能解压出前面的数据
+# - 一次发送的大响应体（超过 threadpool_size）放到线程池中压缩，不阻塞事件循环
+# - 压缩后的响应带 Vary: Accept-Encoding，强 ETag 改为弱 ETag（压缩后的字节和原来不同）
+
+# 压缩级别的选择见 bench_compression.py：级别越高省下的字节越多，CPU 时间也越多，
+# 动态生成的 JSON 一般用 gzip 6、br 4、zstd 3 左右，更高的级别留给构建时预压缩的静态文件。
+# 对这类 JSON，zstd 3 压缩得比 br 4 更小也更快，所以排在 br 前面。
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_CONTENT_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+    "image/svg+xml",
+)
+DEFAULT_LEVELS = {"br": 4, "zstd": 3, "gzip": 6}
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        # wbits=31 表示带 gzip 头
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+COMPRESSORS = {"gzip": GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS["zstd"] = ZstdCompressor
+
+
+def compress(encoding: str, level: int, data: bytes) -> bytes:
+    return COMPRESSORS[encoding](level).finish(data)
+
+
+# 按服务器的优先顺序，返回第一个客户端接受的编码
+def choose_encoding(accept_encoding: str, preferred: List[str]) -> Optional[str]:
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        quality = 1.0
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in preferred:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        encodings: Tuple[str, ...] = ("zstd", "br", "gzip"),
+        levels: Optional[Dict[str, int]] = None,
+        content_types: Tuple[str, ...] = DEFAULT_CONTENT_TYPES,
+        threadpool_size: int = 256 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = [encoding for encoding in encodings if encoding in COMPRESSORS]
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.content_types = content_types
+        self.threadpool_size = threadpool_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def should_compress(self, status: int, headers: Headers) -> bool:
+        if status in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type.startswith(self.content_types)
+
+
+class CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.level = middleware.levels[encoding]
+        self._send = send
+        self.start_message: Optional[Message] = None
+        # 流式响应的第一块到来时才创建
+        self.compressor = None
+        self.passthrough = False
+
+    def set_headers(self, content_length: Optional[int]):
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["content-length"]
+        else:
+            headers["content-length"] = str(content_length)
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            headers["etag"] = "W/" + etag
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            # 先保存响应头，等看到第一块响应体再决定是否压缩
+            self.start_message = message
+            message["headers"] = list(message.get("headers", []))
+            headers = Headers(raw=message["headers"])
+            self.passthrough = not self.middleware.should_compress(message["status"], headers)
+            if self.passthrough:
+                await self._send(message)
+            return
+        if self.passthrough or message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None and not more_body:
+            # 整个响应体一次发送
+            if len(body) < self.middleware.minimum_size:
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+            if len(body) > self.middleware.threadpool_size:
+                body = await anyio.to_thread.run_sync(compress, self.encoding, self.level, body)
+            else:
+                body = compress(self.encoding, self.level, body)
+            self.set_headers(len(body))
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+
+        if self.compressor is None:
+            # 流式响应：声明了 Content-Length 且小于阈值时不压缩，否则逐块压缩
+            length = Headers(raw=self.start_message["headers"]).get("content-length")
+            if length is not None and int(length) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+            self.compressor = COMPRESSORS[self.encoding](self.level)
+            self.set_headers(None)
+            await self._send(self.start_message)
+
+        if more_body:
+            data = self.compressor.compress(body)
+            if data:
+                await self._send({"type": "http.response.body", "body": data, "more_body": True})
+        else:
+            await self._send({"type": "http.response.body", "body": self.compressor.finish(body)})
@@ -6,12 +6,18 @@
 
 from fastapi import Depends, FastAPI, Header, HTTPException
 
+import tutorial_path  # noqa: F401
+from pure_dependency import pure
 
+
+# 两个依赖项的结果只取决于请求头，用 @pure 跨请求缓存，错误的令牌也直接得到缓存的错误，见 pure_dependency.py
+@pure
 async def verify_token(x_token: str = Header(...)):
     if x_token != "fake-super-secret-token":
         raise HTTPException(status_code=400, detail="X-Token header invalid")
 
 
+@pure
 async def verify_key(x_key: str = Header(...)):
     if x_key != "fake-super-secret-key":
         raise HTTPException(status_code=400, detail="X-Key header invalid")
@@ -0,0 +1,10 @@
+# pure_dependency.py 等公共模块在 tutorial 目录下，只保留一份。
+# 在 dependencies 目录下运行（uvicorn Global_Dependencies:app）时 tutorial 目录不在 sys.path 上，
+# 这里把它加到最后，不会遮住同名的模块，运行时也不需要再设置 PYTHONPATH。
+import os
+import sys
+
+TUTORIAL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if TUTORIAL_DIR not in sys.path:
+    sys.path.append(TUTORIAL_DIR)
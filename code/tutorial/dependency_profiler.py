@@ -0,0 +1,361 @@
+# 依赖项耗时分析
+# 一个路径操作往往要先解析好几层依赖项，例如
+# read_users_me → get_current_active_user → get_current_user → oauth2_scheme，
+# 请求慢的时候，单看整个请求的耗时看不出是哪一层慢。
+
+# 计时有开销，只在排查问题时通过环境变量开启（DEPENDENCY_PROFILER=1），
+# 在声明路由之前启用，对之后声明的路由生效：
+
+#     if os.environ.get("DEPENDENCY_PROFILER") == "1":
+#         enable_dependency_profiler(app, dependencies=[Depends(get_current_active_user)])
+
+# 用 APIRouter 声明的路由要在创建 router 时指定：APIRouter(route_class=ProfiledRoute)。
+
+# 每个请求记录：
+# - 每个依赖项（以及路径操作函数本身）的耗时，按依赖关系组成调用栈，
+#   例如 GET /users/me/;get_current_active_user;get_current_user
+#   依赖项在它的子依赖项都解析完之后才会被调用，所以记录的是它自己的耗时，不包含子依赖项
+# - 同步的依赖项要放进线程池执行：单独记录等待线程池的时间（[threadpool]）和线程池跳转的次数
+# - 带 yield 的依赖项：yield 之前的部分记为依赖项本身，yield 之后的退出代码记为 [teardown]，
+#   退出代码在响应发送之后才执行
+# - 调用栈只有路由本身的一条记录的是 FastAPI 自己的开销（参数校验、响应序列化等）
+# 同一个依赖项在一个请求里被多处声明时，FastAPI 只调用一次，记在第一次调用的位置下。
+
+# 汇总结果通过管理接口查看，管理接口会暴露内部实现，只有传入了鉴权依赖项（dependencies）时才会挂载；
+# 没有传入时只计时，结果在进程内通过 dependency_profiler.summary() / folded() 读取：
+# - GET    /admin/profile            每个调用栈的次数、总耗时、平均和最大耗时，以及最近的请求
+# - GET    /admin/profile/flamegraph 折叠栈格式（每行 "调用栈 微秒数"），
+#                                    可以直接交给 flamegraph.pl 或 speedscope 画火焰图
+# - DELETE /admin/profile            清空统计
+
+# 依赖项被替换成了计时用的包装对象；包装对象和原来的依赖项相等（__eq__/__hash__），
+# 所以 app.dependency_overrides 仍然可以按原来的依赖项覆盖，被覆盖的依赖项不再计时。
+# 计时本身有开销（每个依赖项约 10 µs，FastAPI 对包装对象判断调用方式比对普通函数慢），
+# 适合在排查问题时开启，不建议一直开着。
+import functools
+import inspect
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from time import perf_counter_ns
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, FastAPI, Request, params
+from fastapi.concurrency import run_in_threadpool
+from fastapi.dependencies.models import Dependant
+from fastapi.dependencies.utils import is_async_gen_callable, is_coroutine_callable, is_gen_callable
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+
+# (调用栈, 类型, 耗时 ns)
+Record = Tuple[Tuple[str, ...], str, int]
+
+
+class RequestProfile:
+    __slots__ = ("route", "records", "hops", "total_ns")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.records: List[Record] = []
+        self.hops = 0
+        self.total_ns = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "route": self.route,
+            "total_ms": self.total_ns / 1e6,
+            "threadpool_hops": self.hops,
+            "dependencies": [
+                {"stack": ";".join(stack), "kind": kind, "ms": elapsed / 1e6}
+                for stack, kind, elapsed in self.records
+            ],
+        }
+
+
+class StackStats:
+    __slots__ = ("count", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+
+class DependencyProfiler:
+    # 只在事件循环线程中记录，不需要加锁
+    def __init__(self, history: int = 100):
+        self.stacks: Dict[Tuple[str, ...], StackStats] = {}
+        self.kinds: Dict[Tuple[str, ...], str] = {}
+        self.requests = 0
+        self.hops = 0
+        self.recent: deque = deque(maxlen=history)
+
+    def start(self, route: str) -> RequestProfile:
+        profile = RequestProfile(route)
+        self.requests += 1
+        self.recent.append(profile)
+        return profile
+
+    def record(self, profile: RequestProfile, stack: Tuple[str, ...], kind: str, elapsed: int):
+        profile.records.append((stack, kind, elapsed))
+        stats = self.stacks.get(stack)
+        if stats is None:
+            stats = self.stacks[stack] = StackStats()
+            self.kinds[stack] = kind
+        stats.count += 1
+        stats.total_ns += elapsed
+        stats.max_ns = max(stats.max_ns, elapsed)
+
+    def hop(self, profile: RequestProfile):
+        profile.hops += 1
+        self.hops += 1
+
+    def reset(self):
+        self.stacks.clear()
+        self.kinds.clear()
+        self.requests = 0
+        self.hops = 0
+        self.recent.clear()
+
+    def summary(self) -> dict:
+        stacks = sorted(self.stacks.items(), key=lambda item: item[1].total_ns, reverse=True)
+        return {
+            "requests": self.requests,
+            "threadpool_hops": self.hops,
+            "stacks": [
+                {
+                    "stack": ";".join(stack),
+                    "kind": self.kinds[stack],
+                    "count": stats.count,
+                    "total_ms": stats.total_ns / 1e6,
+                    "mean_ms": stats.total_ns / stats.count / 1e6,
+                    "max_ms": stats.max_ns / 1e6,
+                }
+                for stack, stats in stacks
+            ],
+            "recent": [profile.to_dict() for profile in self.recent],
+        }
+
+    # 折叠栈格式：每行是一个调用栈和它自己的耗时（微秒），画图工具会把子栈的宽度累加到父栈上
+    def folded(self) -> str:
+        lines = [
+            f"{';'.join(stack)} {stats.total_ns // 1000}" for stack, stats in self.stacks.items()
+        ]
+        return "\n".join(lines) + "\n"
+
+
+dependency_profiler = DependencyProfiler()
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "current_profile", default=None
+)
+
+
+def frame_name(call: Callable) -> str:
+    name = getattr(call, "__qualname__", None) or type(call).__qualname__
+    return name.replace(";", ":")
+
+
+# 在线程池的线程里记录开始执行的时间，用来计算等待线程池的时间
+def call_in_thread(started: list, func: Callable, *args, **kwargs):
+    started.append(perf_counter_ns())
+    return func(*args, **kwargs)
+
+
+class ProfiledCall:
+    def __init__(self, call: Callable, stack: Tuple[str, ...], profiler: DependencyProfiler):
+        self.call = call
+        self.stack = stack
+        self.teardown_stack = stack + ("[teardown]",)
+        self.profiler = profiler
+        # FastAPI 在有 dependency_overrides 时会按签名重新解析依赖项
+        self.__signature__ = inspect.signature(call)
+
+    def __hash__(self):
+        return hash(self.call)
+
+    def __eq__(self, other):
+        if isinstance(other, ProfiledCall):
+            other = other.call
+        return self.call == other
+
+    def record(
+        self, profile: Optional[RequestProfile], stack: Tuple[str, ...], kind: str, start: int
+    ):
+        if profile is not None:
+            self.profiler.record(profile, stack, kind, perf_counter_ns() - start)
+
+    # 和 FastAPI 一样放进线程池执行，只是由这里发起，才能分别记录等待线程池和执行的时间
+    # 抛出异常时也记录
+    async def in_threadpool(
+        self,
+        profile: Optional[RequestProfile],
+        stack: Tuple[str, ...],
+        kind: str,
+        func: Callable,
+        *args,
+    ):
+        started: list = []
+        scheduled = perf_counter_ns()
+        try:
+            return await run_in_threadpool(call_in_thread, started, func, *args)
+        finally:
+            if profile is not None and started:
+                self.profiler.hop(profile)
+                self.profiler.record(
+                    profile, self.stack + ("[threadpool]",), "threadpool", started[0] - scheduled
+                )
+                self.record(profile, stack, kind, started[0])
+
+
+class AsyncCall(ProfiledCall):
+    async def __call__(self, **values):
+        profile = current_profile.get()
+        start = perf_counter_ns()
+        try:
+            return await self.call(**values)
+        finally:
+            self.record(profile, self.stack, "async", start)
+
+
+class SyncCall(ProfiledCall):
+    async def __call__(self, **values):
+        profile = current_profile.get()
+        return await self.in_threadpool(
+            profile, self.stack, "sync", functools.partial(self.call, **values)
+        )
+
+
+class AsyncGenCall(ProfiledCall):
+    async def __call__(self, **values):
+        profile = current_profile.get()
+        manager = asynccontextmanager(self.call)(**values)
+        start = perf_counter_ns()
+        try:
+            value = await manager.__aenter__()
+        finally:
+            self.record(profile, self.stack, "async yield", start)
+        try:
+            yield value
+        except BaseException as exc:
+            start = perf_counter_ns()
+            try:
+                suppressed = await manager.__aexit__(type(exc), exc, exc.__traceback__)
+            finally:
+                self.record(profile, self.teardown_stack, "teardown", start)
+            if not suppressed:
+                raise
+        else:
+            start = perf_counter_ns()
+            try:
+                await manager.__aexit__(None, None, None)
+            finally:
+                self.record(profile, self.teardown_stack, "teardown", start)
+
+
+class SyncGenCall(ProfiledCall):
+    # yield 之前和之后的部分各在线程池中执行一次
+    async def __call__(self, **values):
+        profile = current_profile.get()
+        manager = contextmanager(self.call)(**values)
+        value = await self.in_threadpool(profile, self.stack, "sync yield", manager.__enter__)
+        try:
+            yield value
+        except BaseException as exc:
+            suppressed = await self.in_threadpool(
+                profile,
+                self.teardown_stack,
+                "teardown",
+                manager.__exit__,
+                type(exc),
+                exc,
+                exc.__traceback__,
+            )
+            if not suppressed:
+                raise
+        else:
+            await self.in_threadpool(
+                profile, self.teardown_stack, "teardown", manager.__exit__, None, None, None
+            )
+
+
+def wrap_call(call: Callable, stack: Tuple[str, ...], profiler: DependencyProfiler) -> ProfiledCall:
+    if is_gen_callable(call):
+        return SyncGenCall(call, stack, profiler)
+    if is_async_gen_callable(call):
+        return AsyncGenCall(call, stack, profiler)
+    if is_coroutine_callable(call):
+        return AsyncCall(call, stack, profiler)
+    return SyncCall(call, stack, profiler)
+
+
+def instrument(dependant: Dependant, stack: Tuple[str, ...], profiler: DependencyProfiler):
+    for sub_dependant in dependant.dependencies:
+        if isinstance(sub_dependant.call, ProfiledCall):
+            continue
+        sub_stack = stack + (frame_name(sub_dependant.call),)
+        # 先处理子依赖项；Dependant 的 cache_key 在创建时已经算好，
+        # 替换 call 不影响同一个请求内的依赖项缓存
+        instrument(sub_dependant, sub_stack, profiler)
+        sub_dependant.call = wrap_call(sub_dependant.call, sub_stack, profiler)
+
+
+class ProfiledRoute(APIRoute):
+    profiler = dependency_profiler
+
+    # APIRoute.__init__ 创建好 self.dependant 之后调用这里
+    def get_route_handler(self):
+        profiler = self.profiler
+        methods = ",".join(sorted(self.methods))
+        route = f"{methods} {self.path}"
+        instrument(self.dependant, (route,), profiler)
+
+        # 路径操作函数本身也计时；FastAPI 在创建处理函数时判断它是不是协程函数，
+        # 所以要用普通的 async 函数包装，不能用 ProfiledCall 对象
+        call = self.dependant.call
+        endpoint = wrap_call(call, (route, frame_name(call)), profiler)
+
+        async def profiled_endpoint(**values):
+            return await endpoint(**values)
+
+        self.dependant.call = profiled_endpoint
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request: Request):
+            profile = profiler.start(route)
+            token = current_profile.set(profile)
+            start = perf_counter_ns()
+            try:
+                return await handler(request)
+            finally:
+                profile.total_ns = perf_counter_ns() - start
+                current_profile.reset(token)
+                # 剩下的时间是 FastAPI 自己的开销：参数校验、响应序列化等
+                # 带 yield 的依赖项的退出代码还没有执行，稍后会追加到同一个 profile 里
+                measured = sum(elapsed for _, _, elapsed in profile.records)
+                profiler.record(profile, (route,), "route", max(profile.total_ns - measured, 0))
+
+        return profiled_handler
+
+
+router = APIRouter(prefix="/admin/profile", tags=["admin"])
+
+
+@router.get("")
+async def read_profile():
+    return dependency_profiler.summary()
+
+
+@router.get("/flamegraph", response_class=PlainTextResponse)
+async def read_flamegraph():
+    return dependency_profiler.folded()
+
+
+@router.delete("", status_code=204)
+async def reset_profile():
+    dependency_profiler.reset()
+
+
+def enable_dependency_profiler(app: FastAPI, dependencies: Optional[Sequence[params.Depends]] = None):
+    app.router.route_class = ProfiledRoute
+    if dependencies:
+        app.include_router(router, dependencies=dependencies)
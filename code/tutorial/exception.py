@@ -1,8 +1,11 @@
 # 处理错误
 from fastapi import FastAPI, HTTPException
 
+from fast_json import FastJSONResponse, enable_fast_json
 
 app = FastAPI()
+# 快速 JSON 模式：HTTPException 和请求验证错误的默认处理器也用 orjson 编码，见 fast_json.py
+enable_fast_json(app)
 
 items = {"foo": "The Foo Wrestlers"}
 
@@ -27,7 +30,6 @@ async def read_item_header(item_id: str):
 
 # 安装自定义异常处理器
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
 
 class UnicornException(Exception):
     def __init__(self, name: str):
@@ -36,7 +38,7 @@ class UnicornException(Exception):
 # 它返回如下内容 {"message": "Oops! yolo did something. There goes a rainbow..."}
 @app.exception_handler(UnicornException)
 async def unicorn_exception_handler(request: Request, exc: UnicornException):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=418,
         content={"message": f"Oops! {exc.name} did something. There goes a rainbow..."},
     )
@@ -87,16 +89,15 @@ async def read_item4(item_id: int):
 # RequestValidationError 包含其接收到的无效数据请求的 body
 # 开发时，可以用这个请求体生成日志、调试错误，并返回给用户
 from fastapi import FastAPI, Request, status
-from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    return JSONResponse(
+    # FastJSONResponse 直接编码，不需要先调用 jsonable_encoder
+    return FastJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content=jsonable_encoder({"detail": exc.errors(), "body": exc.body}),
+        content={"detail": exc.errors(), "body": exc.body},
     )
 
 # FastAPI 也提供了自有的 HTTPException
@@ -108,6 +109,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 # 复用 FastAPI 异常处理器
 # FastAPI 支持先对异常进行某些处理，然后再使用 FastAPI 中处理该异常的默认异常处理器。
 # 从 fastapi.exception_handlers 中导入要复用的默认异常处理器
+# （fast_json 中也有同名的处理器，返回的内容相同，只是用 orjson 编码，enable_fast_json 注册的就是它们）
 from fastapi import FastAPI, HTTPException
 from fastapi.exception_handlers import (
     http_exception_handler,
@@ -0,0 +1,99 @@
+# 缓存 CORS 判定结果
+# Starlette 的 CORSMiddleware 对每个预检请求（OPTIONS + Access-Control-Request-Method）
+# 都要重新判断源是否允许（allow_origins 是 list，逐个比较；再匹配一次正则）、
+# 逐个检查请求的头、复制一份响应头的 dict，再创建一个 PlainTextResponse。
+# 同一个前端页面发出的预检请求，(源, 方法, 请求头) 几乎总是那几种组合。
+
+# CachedCORSMiddleware 是它的子类，参数完全相同，判定规则不变：
+
+#     app.add_middleware(CachedCORSMiddleware, allow_origins=origins, max_age=86400)
+
+# - 启动时把 allow_origins 编译成 frozenset，allow_origin_regex 编译成正则（父类已经做了）
+# - 每个源的判定结果放进 LRU，正则对每个源只匹配一次
+# - 预检响应按 (源, 方法, 请求头) 放进 LRU，命中时直接发送保存好的状态码、响应头和响应体
+# - 两个 LRU 都有大小上限（cache_size），Origin 请求头由客户端任意填写，不能无限增长
+# - max_age 写入 Access-Control-Max-Age，浏览器在这段时间内不再对同样的请求发预检
+#   （Chrome 最多缓存 2 小时，Firefox 最多 24 小时，超过的部分会被浏览器截断）
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.middleware.cors import CORSMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# (状态码, 响应头, 响应体)
+Preflight = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+
+class LRU:
+    # 只在事件循环线程中访问，不需要加锁
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class CachedCORSMiddleware(CORSMiddleware):
+    def __init__(self, app: ASGIApp, cache_size: int = 1024, **kwargs):
+        super().__init__(app, **kwargs)
+        self.allow_origins = frozenset(self.allow_origins)
+        self.origin_cache = LRU(cache_size)
+        self.preflight_cache = LRU(cache_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        origin = headers.get("origin")
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and "access-control-request-method" in headers:
+            status, raw_headers, body = self.preflight(headers)
+            # 每次发送一份新的 list，外层中间件修改响应头时不会改到缓存里的内容
+            await send(
+                {"type": "http.response.start", "status": status, "headers": list(raw_headers)}
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        await self.simple_response(scope, receive, send, request_headers=headers)
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        allowed: Optional[bool] = self.origin_cache.get(origin)
+        if allowed is None:
+            allowed = super().is_allowed_origin(origin)
+            self.origin_cache.set(origin, allowed)
+        return allowed
+
+    def preflight(self, request_headers: Headers) -> Preflight:
+        key = (
+            request_headers["origin"],
+            request_headers["access-control-request-method"],
+            request_headers.get("access-control-request-headers"),
+        )
+        cached = self.preflight_cache.get(key)
+        if cached is None:
+            response = self.preflight_response(request_headers=request_headers)
+            cached = (response.status_code, response.raw_headers, response.body)
+            self.preflight_cache.set(key, cached)
+        return cached
@@ -0,0 +1,288 @@
+# 快速 JSON 序列化模式
+# 默认情况下，带 response_model 的路由返回时要经过：
+# 1. response_model 校验，得到 Pydantic 模型
+# 2. jsonable_encoder 把模型递归转换成 dict/list/str（逐个字段遍历一遍）
+# 3. JSONResponse 再用标准库 json.dumps 把结果遍历一遍编码成字符串
+# 快速模式在第 1 步之后，直接用 model.dict() 取出数据交给 orjson 编码成 bytes，
+# 省掉 jsonable_encoder 的那一遍遍历，orjson 的编码本身也比 json.dumps 快得多。
+# orjson 原生支持 datetime、date、UUID、Enum、dataclass；Decimal 按 jsonable_encoder 的规则转换。
+
+# 在创建 app 之后、声明路由之前启用，对整个 app 生效：
+
+#     app = FastAPI()
+#     enable_fast_json(app)
+
+# - 之后声明的路由都使用 FastJSONRoute，返回值按 response_model 校验后直接编码
+# - 默认响应类改为 FastJSONResponse，返回 dict/list 的路由也用 orjson 编码
+# - HTTPException 和 RequestValidationError 的默认处理器也改为用 FastJSONResponse 返回
+# 路径操作直接返回 Response 时不受影响。
+
+# 可信返回值的字段投影（按路由选择启用）
+# 即使在快速模式下，返回 dict 的路由每次也要先按 response_model 校验成模型，
+# 再按 include/exclude/exclude_unset 把模型转回 dict。
+# 如果路径操作返回的 dict 本来就是可信的（来自自己的存储，字段类型已经正确），
+# 可以用 @trusted_response 标记，路由声明时根据 response_model 和这些参数编译出一个投影计划：
+# 需要输出哪些字段、输出的键名、缺失时的默认值。请求时只按计划挑选字段，不再校验。
+# 代价是基本不做类型转换：只有 float 字段上的 int 会转成 float（price 返回 62 时输出 62.0，和校验后一致），
+# 其他值（包括嵌套的值）原样输出。缺少必填字段时退回完整校验，得到和原来一样的错误。
+import functools
+import inspect
+from decimal import Decimal
+from typing import Any, List, Optional
+
+from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, _prepare_response_content
+from fastapi.utils import is_body_allowed_for_status_code
+from pydantic import BaseModel, ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+from starlette.exceptions import HTTPException
+from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# orjson 不认识的类型交给 default；常见类型走快速分支，其余的退回 jsonable_encoder，保证结果一致
+def default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return jsonable_encoder(obj)
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+
+# 代替 jsonable_encoder，得到的结果可以直接存进 dict 或者用 json.dumps 编码
+def jsonable(content: Any) -> Any:
+    return orjson.loads(dumps(content))
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# 与 FastAPI 的 serialize_response 相同的校验步骤，只是最后不调用 jsonable_encoder
+def to_content(route: APIRoute, raw: Any) -> Any:
+    field = route.response_field
+    if field is None:
+        return raw
+    raw = _prepare_response_content(
+        raw,
+        exclude_unset=route.response_model_exclude_unset,
+        exclude_defaults=route.response_model_exclude_defaults,
+        exclude_none=route.response_model_exclude_none,
+    )
+    value, errors = field.validate(raw, {}, loc=("response",))
+    if errors:
+        if isinstance(errors, ErrorWrapper):
+            errors = [errors]
+        raise ValidationError(errors, field.type_)
+    return dump_models(
+        value,
+        include=route.response_model_include,
+        exclude=route.response_model_exclude,
+        by_alias=route.response_model_by_alias,
+        exclude_unset=route.response_model_exclude_unset,
+        exclude_defaults=route.response_model_exclude_defaults,
+        exclude_none=route.response_model_exclude_none,
+    )
+
+
+# 把校验后的模型（或模型的 list/dict）转成 dict，include/exclude 等参数和 jsonable_encoder 的含义相同
+def dump_models(value: Any, **options) -> Any:
+    if isinstance(value, BaseModel):
+        return value.dict(**options)
+    if isinstance(value, list):
+        return [dump_models(item, **options) for item in value]
+    if isinstance(value, dict):
+        return {key: dump_models(item, **options) for key, item in value.items()}
+    return value
+
+
+def trusted_response(func):
+    func.trusted_response = True
+    return func
+
+
+class MissingField(Exception):
+    pass
+
+
+class ProjectionPlan:
+    def __init__(
+        self,
+        fields: List[tuple],
+        many: bool,
+        exclude_unset: bool,
+        exclude_defaults: bool,
+        exclude_none: bool,
+    ):
+        # (输入的键, 输出的键, ModelField, 是否是 float 字段)
+        self.fields = fields
+        self.many = many
+        self.exclude_unset = exclude_unset
+        self.exclude_defaults = exclude_defaults
+        self.exclude_none = exclude_none
+
+    @classmethod
+    def compile(cls, route: APIRoute) -> "ProjectionPlan":
+        field = route.response_field
+        if field is None:
+            raise ValueError(f"{route.path}: trusted_response requires a response_model")
+        if field.shape == SHAPE_SINGLETON:
+            many = False
+        elif field.shape == SHAPE_LIST:
+            many = True
+        else:
+            raise ValueError(f"{route.path}: trusted_response supports Model or List[Model]")
+        model = field.type_
+        if not (inspect.isclass(model) and issubclass(model, BaseModel)):
+            raise ValueError(f"{route.path}: trusted_response requires a pydantic model")
+
+        include = route.response_model_include
+        exclude = route.response_model_exclude
+        # 只支持顶层字段名组成的 set；嵌套的 include/exclude 需要完整校验
+        for option in (include, exclude):
+            if option is not None and not isinstance(option, (set, frozenset)):
+                raise ValueError(f"{route.path}: trusted_response supports set include/exclude")
+
+        fields = []
+        for name, model_field in model.__fields__.items():
+            if include is not None and name not in include:
+                continue
+            if exclude is not None and name in exclude:
+                continue
+            out_key = model_field.alias if route.response_model_by_alias else name
+            is_float = model_field.shape == SHAPE_SINGLETON and model_field.type_ is float
+            fields.append((model_field.alias, out_key, model_field, is_float))
+        return cls(
+            fields,
+            many,
+            exclude_unset=route.response_model_exclude_unset,
+            exclude_defaults=route.response_model_exclude_defaults,
+            exclude_none=route.response_model_exclude_none,
+        )
+
+    def project_one(self, data: dict) -> dict:
+        result = {}
+        for key, out_key, field, is_float in self.fields:
+            if key in data:
+                value = data[key]
+                # 和校验一样把 int 转成 float；bool 虽然是 int 的子类，这里原样输出
+                if is_float and type(value) is int:
+                    value = float(value)
+            elif field.required:
+                raise MissingField(key)
+            elif self.exclude_unset:
+                continue
+            else:
+                value = field.get_default()
+            if self.exclude_none and value is None:
+                continue
+            if self.exclude_defaults and value == field.default:
+                continue
+            result[out_key] = value
+        return result
+
+    # 返回 None 表示需要退回完整校验
+    def apply(self, raw: Any) -> Optional[Any]:
+        try:
+            if self.many:
+                if not isinstance(raw, list) or not all(isinstance(row, dict) for row in raw):
+                    return None
+                return [self.project_one(row) for row in raw]
+            if not isinstance(raw, dict):
+                return None
+            return self.project_one(raw)
+        except MissingField:
+            return None
+
+
+def response_param_name(endpoint) -> str:
+    for name, param in inspect.signature(endpoint).parameters.items():
+        if param.annotation is Response:
+            return name
+    return "_fast_json_response"
+
+
+class FastJSONRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        is_coroutine = inspect.iscoroutinefunction(endpoint)
+        # FastAPI 会把路径操作声明的 Response 参数（sub_response）传进来，
+        # 要把路径操作在它上面设置的状态码和响应头搬到最终的响应上；
+        # 路径操作没有声明时，额外声明一个
+        name = response_param_name(endpoint)
+        declared = name != "_fast_json_response"
+        trusted = getattr(endpoint, "trusted_response", False)
+
+        @functools.wraps(endpoint)
+        async def fast_endpoint(*args, **values):
+            sub_response: Response = values[name] if declared else values.pop(name)
+            if is_coroutine:
+                raw = await endpoint(*args, **values)
+            else:
+                raw = await run_in_threadpool(endpoint, *args, **values)
+            if isinstance(raw, Response):
+                return raw
+            content = self.projection.apply(raw) if self.projection else None
+            if content is None:
+                if is_coroutine:
+                    content = to_content(self, raw)
+                else:
+                    content = await run_in_threadpool(to_content, self, raw)
+            status_code = sub_response.status_code or self.status_code or 200
+            response = FastJSONResponse(content, status_code=status_code)
+            if not is_body_allowed_for_status_code(status_code):
+                response.body = b""
+            response.headers.raw.extend(sub_response.headers.raw)
+            return response
+
+        if not declared:
+            signature = inspect.signature(endpoint)
+            parameters = list(signature.parameters.values())
+            parameters.append(
+                inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, annotation=Response)
+            )
+            fast_endpoint.__signature__ = signature.replace(parameters=parameters)
+        super().__init__(path, fast_endpoint, **kwargs)
+        # 投影计划在声明路由时编译一次
+        self.projection = ProjectionPlan.compile(self) if trusted else None
+
+
+async def http_exception_handler(request: Request, exc: HTTPException) -> Response:
+    headers = getattr(exc, "headers", None)
+    if not is_body_allowed_for_status_code(exc.status_code):
+        return Response(status_code=exc.status_code, headers=headers)
+    return FastJSONResponse(
+        {"detail": exc.detail}, status_code=exc.status_code, headers=headers
+    )
+
+
+async def request_validation_exception_handler(
+    request: Request, exc: RequestValidationError
+) -> Response:
+    return FastJSONResponse(
+        {"detail": exc.errors()}, status_code=HTTP_422_UNPROCESSABLE_ENTITY
+    )
+
+
+def enable_fast_json(app: FastAPI):
+    if orjson is None:
+        raise RuntimeError("fast JSON mode requires: pip install orjson")
+    app.router.route_class = FastJSONRoute
+    app.router.default_response_class = FastJSONResponse
+    app.add_exception_handler(HTTPException, http_exception_handler)
+    app.add_exception_handler(RequestValidationError, request_validation_exception_handler)
@@ -0,0 +1,265 @@
+# 高性能静态文件
+# StaticFiles 每个请求都要 stat 文件、打开文件、按 64 KB 一块读出来发送，
+# 没有内存缓存，不支持 Range 请求，也不会使用预先压缩好的 .br/.gz 文件。
+
+# CachedStaticFiles 是 StaticFiles 的子类，用法相同：
+#     app.mount("/static", CachedStaticFiles(directory="static"), name="static")
+
+# - 热点文件缓存：不超过 max_file_size 的文件读入内存，按 LRU 淘汰，总大小不超过 max_cache_bytes。
+#   缓存键是 (设备号, inode, mtime, 大小)，文件被修改或替换后键就变了，旧内容不会再被使用
+# - 预压缩文件：请求头 Accept-Encoding 接受 br/gzip，并且旁边存在 app.js.br/app.js.gz 时，
+#   直接发送压缩好的文件并设置 Content-Encoding，不在请求时压缩
+# - Range：支持单个区间（bytes=0-99、bytes=100-、bytes=-100），返回 206；
+#   多个区间时返回完整内容，这是 HTTP 允许的
+# - 零拷贝发送：大文件不进入缓存；服务器支持 ASGI 的 http.response.zerocopysend 扩展时，
+#   把文件描述符交给服务器用 sendfile 直接从内核发送，否则退回按块读取发送
+# - 缓存头：文件名带内容指纹（例如 app.3f9a1c2b.js）的文件设置一年的 immutable 缓存，
+#   其他文件要求浏览器每次用 ETag 重新验证
+import os
+import re
+from collections import OrderedDict
+from email.utils import formatdate, parsedate
+from mimetypes import guess_type
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+from starlette.types import Receive, Scope, Send
+
+# 按优先级排列的预压缩格式
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+FINGERPRINT = re.compile(r"\.[0-9a-f]{8,}\.\w+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+class FileCache:
+    # 只在事件循环线程中访问，不需要加锁
+    def __init__(self, max_cache_bytes: int, max_file_size: int):
+        self.max_cache_bytes = max_cache_bytes
+        self.max_file_size = max_file_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        body = self._data.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return body
+
+    def set(self, key: tuple, body: bytes):
+        if key in self._data:
+            return
+        self._data[key] = body
+        self.size += len(body)
+        while self.size > self.max_cache_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+
+
+def file_key(stat_result: os.stat_result) -> tuple:
+    return (stat_result.st_dev, stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def make_etag(stat_result: os.stat_result) -> str:
+    return '"{:x}-{:x}-{:x}"'.format(
+        stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+    )
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    accepted = []
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.append(name.strip().lower())
+    return accepted
+
+
+# 返回 (start, end)，end 不包含；None 表示忽略 Range 发送完整内容；抛出 ValueError 表示无法满足
+def parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    unit, _, ranges = value.partition("=")
+    if unit.strip() != "bytes" or "," in ranges:
+        return None
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                raise ValueError(value)
+            return max(size - length, 0), size
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    if start >= size or end <= start:
+        raise ValueError(value)
+    return start, min(end, size)
+
+
+def is_not_modified(request_headers: Headers, etag: str, last_modified: str) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = parsedate(request_headers.get("if-modified-since", ""))
+    return if_modified_since is not None and if_modified_since >= parsedate(last_modified)
+
+
+class StaticFileResponse:
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        static: "CachedStaticFiles",
+        full_path: str,
+        stat_result: os.stat_result,
+        status_code: int = 200,
+    ):
+        self.static = static
+        self.full_path = full_path
+        self.stat_result = stat_result
+        self.status_code = status_code
+
+    # 选择要发送的文件：客户端接受且存在的预压缩文件，否则是原文件
+    async def choose_variant(self, request_headers: Headers):
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            try:
+                stat_result = await anyio.to_thread.run_sync(os.stat, self.full_path + suffix)
+            except OSError:
+                continue
+            return self.full_path + suffix, stat_result, encoding
+        return self.full_path, self.stat_result, None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        request_headers = Headers(scope=scope)
+        path, stat_result, encoding = await self.choose_variant(request_headers)
+        size = stat_result.st_size
+        etag = make_etag(stat_result)
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+
+        headers: Dict[str, str] = {
+            "content-type": guess_type(self.full_path)[0] or "text/plain",
+            "etag": etag,
+            "last-modified": last_modified,
+            "accept-ranges": "bytes",
+            "vary": "Accept-Encoding",
+            "cache-control": IMMUTABLE if FINGERPRINT.search(self.full_path) else REVALIDATE,
+        }
+        if encoding is not None:
+            headers["content-encoding"] = encoding
+
+        status_code = self.status_code
+        start, end = 0, size
+        if status_code == 200 and is_not_modified(request_headers, etag, last_modified):
+            await self.send_headers(send, 304, headers)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if status_code == 200 and range_header and (if_range is None or if_range == etag):
+            try:
+                requested = parse_range(range_header, size)
+            except ValueError:
+                headers["content-range"] = f"bytes */{size}"
+                headers["content-length"] = "0"
+                await self.send_headers(send, 416, headers)
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if requested is not None:
+                start, end = requested
+                status_code = 206
+                headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+
+        headers["content-length"] = str(end - start)
+        await self.send_headers(send, status_code, headers)
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await self.send_body(scope, send, path, stat_result, start, end)
+
+    @staticmethod
+    async def send_headers(send: Send, status_code: int, headers: Dict[str, str]):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+            }
+        )
+
+    async def send_body(
+        self, scope: Scope, send: Send, path: str, stat_result: os.stat_result, start: int, end: int
+    ):
+        cache = self.static.cache
+        if stat_result.st_size <= cache.max_file_size:
+            key = file_key(stat_result)
+            body = cache.get(key)
+            if body is None:
+                body = await anyio.to_thread.run_sync(read_file, path)
+                # 读取期间文件被修改时长度会对不上，不放进缓存
+                if len(body) == stat_result.st_size:
+                    cache.set(key, body)
+            await send({"type": "http.response.body", "body": body[start:end]})
+            return
+
+        with open(path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": f,
+                        "offset": start,
+                        "count": end - start,
+                    }
+                )
+                return
+            position = start
+            while position < end:
+                count = min(self.chunk_size, end - position)
+                chunk = await anyio.to_thread.run_sync(os.pread, f.fileno(), count, position)
+                if not chunk:
+                    break
+                position += len(chunk)
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": position < end}
+                )
+            if position < end:
+                # 文件在发送过程中被截断
+                await send({"type": "http.response.body", "body": b""})
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class CachedStaticFiles(StaticFiles):
+    def __init__(
+        self,
+        *args,
+        max_cache_bytes: int = 64 * 1024 * 1024,
+        max_file_size: int = 1024 * 1024,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.cache = FileCache(max_cache_bytes, max_file_size)
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        return StaticFileResponse(self, str(full_path), stat_result, status_code)
@@ -100,3 +100,77 @@ async def create_file3(
         "token": token,
         "fileb_content_type": fileb.content_type,
     }
+
+
+# 流式上传
+# 上面的 bytes 会把整个文件读进内存，UploadFile 要等整个请求体解析完、转存到临时文件后路径操作才开始执行。
+# stream_multipart 边接收边解析，每个 part 都是一个异步字节流，可以直接写入磁盘或者计算摘要，
+# 上传多大的文件，内存占用都只有几块数据的大小，见 streaming_upload.py。
+# 注意：这里不能声明 File/Form 参数，否则 FastAPI 会先把整个请求体解析一遍。
+import os
+import uuid
+
+from fastapi import HTTPException, Request
+
+from streaming_upload import digest_part, save_part, stream_multipart
+
+UPLOAD_DIR = "uploads"
+MAX_UPLOAD_SIZE = 10 * 1024 ** 3
+# 普通表单字段会被整个读进内存
+MAX_FIELD_SIZE = 1024 ** 2
+
+
+# 文件写入 UPLOAD_DIR，同时计算 sha256；普通表单字段原样返回
+# 请求中途失败时，删除这个请求已经保存的文件（写了一半的文件由 save_part 删除）
+@app.post("/stream/files/")
+async def stream_files(request: Request):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    files = []
+    fields = {}
+    try:
+        async for part in stream_multipart(
+            request, max_part_size=MAX_UPLOAD_SIZE, max_field_size=MAX_FIELD_SIZE
+        ):
+            if part.filename is None:
+                try:
+                    fields[part.name] = (await part.read()).decode()
+                except UnicodeDecodeError:
+                    # 已经保存的文件由下面的 except 删除
+                    raise HTTPException(
+                        status_code=400, detail=f"Field {part.name!r} is not valid UTF-8"
+                    )
+                continue
+            # 不使用客户端提供的文件名作为路径
+            stored_name = uuid.uuid4().hex
+            size, sha256 = await save_part(part, os.path.join(UPLOAD_DIR, stored_name))
+            files.append(
+                {
+                    "field": part.name,
+                    "filename": part.filename,
+                    "stored_name": stored_name,
+                    "size": size,
+                    "sha256": sha256,
+                }
+            )
+    except BaseException:
+        for file in files:
+            os.remove(os.path.join(UPLOAD_DIR, file["stored_name"]))
+        raise
+    return {"files": files, "fields": fields}
+
+
+# 只计算摘要，不保存文件
+@app.post("/stream/digest/")
+async def stream_digest(request: Request):
+    result = []
+    async for part in stream_multipart(request, max_part_size=MAX_UPLOAD_SIZE):
+        size, sha256 = await digest_part(part)
+        result.append({"field": part.name, "filename": part.filename, "size": size, "sha256": sha256})
+    return result
+
+
+# 可续传的分块上传
+# 大文件可以分块（也可以并行）上传，网络中断后通过 HEAD 查询已收到的位置继续上传，见 resumable_upload.py
+import resumable_upload
+
+app.include_router(resumable_upload.router)
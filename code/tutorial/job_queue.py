@@ -0,0 +1,348 @@
+# 持久化的后台任务队列
+# BackgroundTasks 在同一个进程里、响应发出之后执行任务，任务只存在于内存中，
+# 进程重启或崩溃时还没执行的任务就丢失了，任务失败也不会重试。
+
+# 这里把任务写进 SQLite 表，由单独的 worker 进程取出执行：
+# - 路由通过 JobTasks.add_task 入队，用法和 BackgroundTasks 一样，返回响应前任务已经提交到数据库
+# - worker 每次在一个事务里领取一批任务（batch_size），交给线程池并发执行（concurrency），
+#   再在一个事务里写回这一批的结果
+# - 失败的任务按指数退避重新排队，超过 max_attempts 次标记为 failed
+# - worker 崩溃时处于 running 状态的任务，超过 visibility_timeout 后会被重新排队，
+#   worker 运行期间每隔 requeue_interval 秒检查一次；已经用完 max_attempts 次的标记为 failed
+
+# 任务函数不能直接存进数据库，只保存注册时的名字和 JSON 参数，
+# 所以任务函数要先用 register 注册，参数必须能被 JSON 序列化。
+
+# 数据库文件默认是当前目录下的 jobs.db，可以通过环境变量 JOBS_DB 指定。
+
+# 启动 worker（background_tasks 是注册任务的模块）：
+#     python job_queue.py background_tasks --concurrency 4
+import argparse
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("job_queue")
+
+DEFAULT_PATH = os.environ.get("JOBS_DB", "jobs.db")
+
+# 任务名 -> 函数
+registry: Dict[str, Callable] = {}
+
+
+def register(func: Callable = None, *, name: Optional[str] = None):
+    def decorator(func: Callable):
+        registry[name or func.__name__] = func
+        func.job_name = name or func.__name__
+        return func
+
+    if func is None:
+        return decorator
+    return decorator(func)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    args TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    locked_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_run_at ON jobs (status, run_at);
+"""
+
+
+class Job:
+    __slots__ = ("id", "name", "args", "kwargs", "attempts", "max_attempts")
+
+    def __init__(self, id, name, args, kwargs, attempts, max_attempts):
+        self.id = id
+        self.name = name
+        self.args = json.loads(args)
+        self.kwargs = json.loads(kwargs)
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+
+
+class JobQueue:
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        max_attempts: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 300.0,
+        visibility_timeout: float = 600.0,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.visibility_timeout = visibility_timeout
+        # 同步路由在线程池里执行，多个线程共用一个连接，用锁串行化
+        # isolation_level=None：由我们自己写 BEGIN，避免 sqlite3 模块隐式开启事务
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL 下 API 进程写入和 worker 进程读取互不阻塞
+            # synchronous=NORMAL：每次提交不再 fsync，断电可能丢失最后几个事务，进程崩溃不会
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _row(self, func: Callable, args: tuple, kwargs: dict, max_attempts, now: float):
+        name = getattr(func, "job_name", None)
+        if name is None or registry.get(name) is not func:
+            raise ValueError(f"{func!r} is not a registered job, use job_queue.register")
+        return (
+            name,
+            json.dumps(args),
+            json.dumps(kwargs),
+            max_attempts or self.max_attempts,
+            now,
+        )
+
+    def enqueue(self, func: Callable, *args, max_attempts: int = None, **kwargs) -> int:
+        row = self._row(func, args, kwargs, max_attempts, time.time())
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (name, args, kwargs, max_attempts, run_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                row,
+            )
+        return cursor.lastrowid
+
+    # 一个事务写入多条任务，每条任务只分摊到一次提交的一小部分
+    def enqueue_many(self, jobs: List[Tuple[Callable, tuple, dict]]):
+        now = time.time()
+        rows = [self._row(func, args, kwargs, None, now) for func, args, kwargs in jobs]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO jobs (name, args, kwargs, max_attempts, run_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # 领取一批到期的任务并标记为 running
+    # BEGIN IMMEDIATE 先拿到写锁，多个 worker 进程不会领到同一个任务
+    def claim(self, batch_size: int) -> List[Job]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, name, args, kwargs, attempts, max_attempts FROM jobs "
+                    "WHERE status = 'queued' AND run_at <= ? ORDER BY run_at, id LIMIT ?",
+                    (now, batch_size),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET status = 'running', locked_at = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    [(now, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [Job(*row) for row in rows]
+
+    def backoff(self, attempts: int) -> float:
+        return min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+
+    # 一个事务写回一批任务的结果
+    # 成功的任务直接删除；失败的任务重新排队或标记为 failed，保留错误信息
+    def finish(self, done: List[int], failed: List[Tuple[Job, str]]):
+        now = time.time()
+        retries = []
+        dead = []
+        for job, error in failed:
+            # claim 时已经把 attempts 加 1
+            attempts = job.attempts + 1
+            if attempts >= job.max_attempts:
+                dead.append((error, job.id))
+            else:
+                retries.append((now + self.backoff(attempts), error, job.id))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in done])
+                self._conn.executemany(
+                    "UPDATE jobs SET status = 'queued', run_at = ?, last_error = ?, "
+                    "locked_at = NULL WHERE id = ?",
+                    retries,
+                )
+                self._conn.executemany(
+                    "UPDATE jobs SET status = 'failed', last_error = ?, "
+                    "locked_at = NULL WHERE id = ?",
+                    dead,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # 把领取后长时间没有写回结果的任务（worker 已经崩溃）重新排队，返回重新排队的任务数
+    # claim 时已经计入了这一次尝试，用完 max_attempts 次的不再排队，标记为 failed
+    def requeue_stale(self) -> int:
+        deadline = time.time() - self.visibility_timeout
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', last_error = 'visibility timeout', "
+                    "locked_at = NULL "
+                    "WHERE status = 'running' AND locked_at < ? AND attempts >= max_attempts",
+                    (deadline,),
+                )
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', last_error = 'visibility timeout', "
+                    "locked_at = NULL WHERE status = 'running' AND locked_at < ?",
+                    (deadline,),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+
+# 与 BackgroundTasks 相同的 add_task 接口，任务在调用时就写入队列
+class JobTasks:
+    def __init__(self, queue: JobQueue):
+        self.queue = queue
+
+    def add_task(self, func: Callable, *args, **kwargs) -> int:
+        return self.queue.enqueue(func, *args, **kwargs)
+
+
+class Worker:
+    def __init__(
+        self,
+        queue: JobQueue,
+        concurrency: int = 4,
+        batch_size: int = 100,
+        poll_interval: float = 0.5,
+        requeue_interval: float = 60.0,
+    ):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.requeue_interval = requeue_interval
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="job-worker"
+        )
+        self._stop = threading.Event()
+
+    def _execute(self, job: Job) -> Optional[str]:
+        func = registry.get(job.name)
+        if func is None:
+            return f"unknown job {job.name!r}"
+        try:
+            func(*job.args, **job.kwargs)
+        except Exception as exc:
+            logger.exception("job %s (%s) failed", job.id, job.name)
+            return repr(exc)
+        return None
+
+    # 执行一批任务，返回领取到的任务数
+    def run_batch(self) -> int:
+        jobs = self.queue.claim(self.batch_size)
+        if not jobs:
+            return 0
+        done = []
+        failed = []
+        for job, error in zip(jobs, self.executor.map(self._execute, jobs)):
+            if error is None:
+                done.append(job.id)
+            else:
+                failed.append((job, error))
+        self.queue.finish(done, failed)
+        return len(jobs)
+
+    # 一直执行到队列中没有到期的任务
+    def drain(self) -> int:
+        total = 0
+        while True:
+            count = self.run_batch()
+            if not count:
+                return total
+            total += count
+
+    # 其他 worker 可能在运行期间崩溃，所以不只在启动时检查一次超时的任务
+    def run(self):
+        next_requeue = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_requeue:
+                requeued = self.queue.requeue_stale()
+                if requeued:
+                    logger.warning("requeued %d stale jobs", requeued)
+                next_requeue = now + self.requeue_interval
+            if not self.run_batch():
+                self._stop.wait(self.poll_interval)
+        self.executor.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the background job worker")
+    parser.add_argument("module", help="module that registers the jobs")
+    parser.add_argument("--db", default=DEFAULT_PATH)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--requeue-interval", type=float, default=60.0)
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    importlib.import_module(options.module)
+    worker = Worker(
+        JobQueue(options.db),
+        concurrency=options.concurrency,
+        batch_size=options.batch_size,
+        poll_interval=options.poll_interval,
+        requeue_interval=options.requeue_interval,
+    )
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    # 以脚本运行时本模块是 __main__，而任务模块 import 的是 job_queue，
+    # 两者的 registry 不是同一个对象，所以要通过 job_queue 模块启动
+    import job_queue
+
+    job_queue.main()
@@ -0,0 +1,135 @@
+# 缓冲、批量写入的日志
+# write_log 每次调用都 open → write → close 一次 log.txt，
+# 请求多的时候每个请求都有一对 open/close 系统调用，所有线程还在争同一个文件。
+
+# BufferedLogSink 只在内存里追加，由后台线程批量写入：
+# - 整个进程只打开一次文件，一直持有这个文件句柄
+# - 消息先放进有上限的环形缓冲区（capacity），写满时丢弃最旧的消息并计数，调用方永远不会阻塞
+# - 缓冲区里的字节数达到 flush_bytes，或者距离上次写入超过 flush_interval 秒时，一次性写入文件
+# - fsync 策略：
+#     never    只 write，什么时候落盘由操作系统决定，进程崩溃不丢，断电可能丢
+#     flush    每次批量写入后 fsync
+#     interval 最多每 fsync_interval 秒 fsync 一次
+# 进程退出时（atexit）会写入剩余的消息。
+# close() 写完剩余消息后关闭文件；之后再 write 会重新打开文件、启动后台线程，
+# 例如应用在同一进程里 shutdown 后又 startup（测试中多次进入 TestClient），日志不会丢。
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+FSYNC_POLICIES = ("never", "flush", "interval")
+
+
+class BufferedLogSink:
+    def __init__(
+        self,
+        path: str,
+        capacity: int = 100_000,
+        flush_bytes: int = 64 * 1024,
+        flush_interval: float = 1.0,
+        fsync: str = "never",
+        fsync_interval: float = 1.0,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.dropped = 0
+        self.flushes = 0
+        self._buffer = deque(maxlen=capacity)
+        self._pending_bytes = 0
+        self._cond = threading.Condition()
+        # 保证取出消息和写入文件的顺序一致，后台线程和 flush() 不会交错写入
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._thread = None
+        self._closed = False
+        self._last_fsync = time.monotonic()
+
+    # 只做内存追加，后台线程在第一次写入（或 close 之后的第一次写入）时启动
+    # 正在 close 时写入的消息由 close 最后一次写入文件
+    def write(self, message: str):
+        with self._cond:
+            if self._thread is None:
+                self._start()
+            if len(self._buffer) == self._buffer.maxlen:
+                self._pending_bytes -= len(self._buffer[0])
+                self.dropped += 1
+            self._buffer.append(message)
+            self._pending_bytes += len(message)
+            if self._pending_bytes >= self.flush_bytes:
+                self._cond.notify()
+
+    def _start(self):
+        self._file = open(self.path, mode="a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _take(self) -> list:
+        messages = list(self._buffer)
+        self._buffer.clear()
+        self._pending_bytes = 0
+        return messages
+
+    def _write(self, messages: list):
+        if not messages:
+            return
+        self._file.write("".join(messages))
+        self._file.flush()
+        self.flushes += 1
+        now = time.monotonic()
+        if self.fsync == "flush" or (
+            self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval
+        ):
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or self._pending_bytes >= self.flush_bytes,
+                    timeout=self.flush_interval,
+                )
+            # 写文件时不持有 _cond，write 不会被磁盘 IO 阻塞
+            with self._write_lock:
+                with self._cond:
+                    messages = self._take()
+                    closed = self._closed
+                self._write(messages)
+            if closed:
+                return
+
+    # 立即写入缓冲区中的消息，供测试和关闭时使用
+    def flush(self):
+        with self._write_lock:
+            with self._cond:
+                messages = self._take()
+            if self._file is not None:
+                self._write(messages)
+
+    def close(self):
+        with self._cond:
+            if self._thread is None or self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        thread.join()
+        # 持有 _cond 完成收尾，期间的 write 等待收尾结束后重新启动
+        with self._write_lock:
+            with self._cond:
+                self._write(self._take())
+                if self.fsync != "never":
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+                self._thread = None
+                self._closed = False
+                atexit.unregister(self.close)
@@ -1,8 +1,13 @@
 from fastapi import FastAPI
 from enum import Enum
 
+from compression import CompressionMiddleware
+
 app = FastAPI()
 
+# 响应压缩，见 compression.py
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
 # 使用预设的枚举值
 class ModelName(str, Enum):
     alexnet = "alexnet"
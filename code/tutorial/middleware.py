@@ -38,7 +38,6 @@ from fastapi import FastAPI, Request
 app = FastAPI()
 
 
-@app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     start_time = time.time()
     response = await call_next(request)
@@ -46,4 +45,194 @@ async def add_process_time_header(request: Request, call_next):
     response.headers["X-Process-Time"] = str(process_time)
     return response
 
-# 感觉和装饰器差不多
\ No newline at end of file
+# 感觉和装饰器差不多
+
+
+# 纯 ASGI 中间件
+# @app.middleware("http") 底层是 Starlette 的 BaseHTTPMiddleware：
+# call_next 会为路径操作再开一个任务，并通过内存流把响应一块块转交回来，
+# 每个请求都多了一次任务切换和流的开销，流式响应也失去了背压（发送方不会等待客户端读完）。
+# 下面的 ProcessTimeMiddleware 直接实现 ASGI 接口，
+# 在 http.response.start 消息发出前把响应头加进去，其余消息原样转发。
+# 上面的 add_process_time_header 不再注册，保留作对比，见 bench_middleware.py。
+class ProcessTimeMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                process_time = time.perf_counter() - start_time
+                headers = list(message.get("headers", []))
+                headers.append((b"x-process-time", str(process_time).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+app.add_middleware(ProcessTimeMiddleware)
+
+
+# 按路由统计的指标中间件
+# 上面的 X-Process-Time 只是把耗时写进响应头，没有任何汇总。
+# MetricsMiddleware 按路由模板（例如 /users/{user_id}，而不是实际路径 /users/42）统计：
+# - 延迟直方图（Prometheus 的 histogram，累计桶）
+# - 请求体和响应体的字节数
+# - 各状态码的请求数
+# 并通过 /metrics 以 Prometheus 文本格式输出。
+
+# 实现要点：
+# - 直接实现 ASGI 接口，而不是 @app.middleware("http")，避免额外的任务和内存流
+# - 使用 time.perf_counter_ns()，全程整数运算
+# - 中间件只在事件循环线程中运行，计数器是普通的整数自增，不需要加锁
+# - 只有匹配到路由时才使用路由模板作为标签，未匹配的请求统一记为 <unmatched>，避免标签数量无限增长
+from bisect import bisect_left
+from time import perf_counter_ns
+
+from fastapi.responses import PlainTextResponse
+
+# 直方图的桶上限，单位秒
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LATENCY_BUCKETS_NS = [int(bucket * 1_000_000_000) for bucket in LATENCY_BUCKETS]
+
+
+class RouteStats:
+    __slots__ = (
+        "buckets",
+        "count",
+        "latency_sum_ns",
+        "request_bytes",
+        "response_bytes",
+        "statuses",
+    )
+
+    def __init__(self):
+        # 最后一个桶对应 +Inf
+        self.buckets = [0] * (len(LATENCY_BUCKETS_NS) + 1)
+        self.count = 0
+        self.latency_sum_ns = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes = {}
+
+    def observe(self, method, path, status, elapsed_ns, request_bytes, response_bytes):
+        key = (method, path)
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteStats()
+        stats.buckets[bisect_left(LATENCY_BUCKETS_NS, elapsed_ns)] += 1
+        stats.count += 1
+        stats.latency_sum_ns += elapsed_ns
+        stats.request_bytes += request_bytes
+        stats.response_bytes += response_bytes
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def render(self) -> str:
+        lines = [
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, path), stats in self.routes.items():
+            labels = f'method="{method}",route="{path}"'
+            cumulative = 0
+            for bucket, count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(
+                    f'http_request_duration_seconds_bucket{{{labels},le="{bucket}"}} {cumulative}'
+                )
+            lines.append(
+                f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}'
+            )
+            lines.append(
+                f"http_request_duration_seconds_sum{{{labels}}} {stats.latency_sum_ns / 1e9}"
+            )
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+        lines.append("# TYPE http_request_size_bytes_total counter")
+        for (method, path), stats in self.routes.items():
+            labels = f'method="{method}",route="{path}"'
+            lines.append(f"http_request_size_bytes_total{{{labels}}} {stats.request_bytes}")
+
+        lines.append("# TYPE http_response_size_bytes_total counter")
+        for (method, path), stats in self.routes.items():
+            labels = f'method="{method}",route="{path}"'
+            lines.append(f"http_response_size_bytes_total{{{labels}}} {stats.response_bytes}")
+
+        lines.append("# TYPE http_requests_total counter")
+        for (method, path), stats in self.routes.items():
+            for status, count in stats.statuses.items():
+                labels = f'method="{method}",route="{path}",status="{status}"'
+                lines.append(f"http_requests_total{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter_ns()
+        status = 500
+        request_bytes = 0
+        response_bytes = 0
+
+        async def receive_wrapper():
+            nonlocal request_bytes
+            message = await receive()
+            request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            else:
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            # 路由匹配成功后，FastAPI 会把匹配到的路由写入 scope["route"]
+            route = scope.get("route")
+            path = route.path if route is not None else "<unmatched>"
+            self.registry.observe(
+                scope["method"],
+                path,
+                status,
+                perf_counter_ns() - start,
+                request_bytes,
+                response_bytes,
+            )
+
+
+metrics_registry = MetricsRegistry()
+app.add_middleware(MetricsMiddleware, registry=metrics_registry)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/users/{user_id}")
+async def read_user(user_id: int):
+    return {"user_id": user_id}
\ No newline at end of file
@@ -0,0 +1,141 @@
+# 跨请求缓存纯依赖项的结果
+# Depends 的缓存（use_cache）只在同一个请求内有效，下一个请求会重新调用依赖项。
+# 有些依赖项的结果只取决于它的参数（查询参数、请求头、子依赖项的结果），
+# 而且调用本身开销较大，或者是同步函数（每次都要放进线程池），
+# 可以用 @pure 标记，按参数把结果缓存起来，相同的参数直接返回上次的结果：
+
+#     @pure
+#     def load_settings(region: str = Query("cn")):
+#         return read_settings_file(region)
+
+#     app = FastAPI(dependencies=[Depends(pure(verify_token))])    # 全局依赖项也可以
+
+# - 缓存是有大小上限的 LRU（maxsize），参数可能由客户端任意填写，不能无限增长
+# - 依赖项抛出的 HTTPException 也会缓存，相同的错误令牌直接得到相同的错误
+#   其他异常（程序错误、暂时性的故障）不缓存
+# - 同步的依赖项每次都要放进线程池执行；命中缓存时连线程池都不需要
+# - 和 functools.lru_cache 一样，提供 cache_info() 和 cache_clear()
+
+# 使用限制：
+# - 只能标记纯依赖项：不读写数据库、不读当前时间、没有 yield
+# - 参数中不能有 Request、Response、BackgroundTasks 等每个请求不同的对象，声明时会检查
+# - 只有参数都是简单的值（None、bool、数字、str、bytes 以及由它们组成的 list/tuple/set/dict）时才缓存；
+#   子依赖项返回了数据库会话这类对象时不缓存，否则每个会话都会作为键留在 LRU 里
+# - 所有请求拿到的是同一个结果对象，路径操作不能修改它
+#   所以不要用它包装 CommonQueryParams 这样的类：所有请求会共用同一个可变的实例
+# FastAPI 仍然会在调用依赖项之前解析、校验参数，缓存跳过的只是依赖项本身的调用。
+# 所以像 common_parameters 这样只是组装参数的异步依赖项，缓存前后差别不大（见 bench_pure_dependency.py）；
+# 收益主要来自同步的依赖项（省掉线程池）和调用本身开销较大的依赖项。
+import functools
+import inspect
+from collections import OrderedDict, namedtuple
+from typing import Any, Callable, Optional
+
+from fastapi import BackgroundTasks, Request, Response, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import SecurityScopes
+from starlette.exceptions import HTTPException
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+# 每个请求都不同的参数类型，依赖项声明了它们就不是纯的
+IMPURE_TYPES = (Request, Response, WebSocket, BackgroundTasks, SecurityScopes)
+
+
+def freeze(value: Any) -> Any:
+    # 列表类型的查询参数（List[str] = Query(None)）会以 list 传进来
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+SIMPLE_TYPES = (type(None), bool, int, float, str, bytes)
+
+
+# freeze 之后的参数是否只由简单的值组成
+def is_simple(value: Any) -> bool:
+    if isinstance(value, (tuple, frozenset)):
+        return all(is_simple(item) for item in value)
+    return isinstance(value, SIMPLE_TYPES)
+
+
+# 复制一份再抛出，避免并发的请求共用同一个异常对象的 traceback
+# HTTPException 的 __init__ 参数和 args 不一致，不能用 copy.copy
+def clone_exception(exc: BaseException) -> BaseException:
+    clone = type(exc).__new__(type(exc))
+    clone.args = exc.args
+    clone.__dict__.update(exc.__dict__)
+    return clone
+
+
+def pure(func: Optional[Callable] = None, *, maxsize: int = 1024):
+    if func is None:
+        return functools.partial(pure, maxsize=maxsize)
+
+    signature = inspect.signature(func)
+    for name, param in signature.parameters.items():
+        if inspect.isclass(param.annotation) and issubclass(param.annotation, IMPURE_TYPES):
+            raise ValueError(f"{func.__name__}: parameter {name!r} is per-request, not pure")
+    if inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func):
+        raise ValueError(f"{func.__name__}: dependencies with yield cannot be cached")
+
+    is_coroutine = inspect.iscoroutinefunction(func)
+    # 只在事件循环线程中访问，不需要加锁
+    cache: "OrderedDict[Any, tuple]" = OrderedDict()
+    stats = {"hits": 0, "misses": 0}
+
+    # updated=()：func 可能是类，不能把类的 __dict__ 合并到函数上
+    @functools.wraps(func, updated=())
+    async def wrapper(**kwargs):
+        try:
+            key = tuple(sorted((name, freeze(value)) for name, value in kwargs.items()))
+        except TypeError:
+            # 参数无法排序（例如 dict 的键类型混杂），不缓存
+            key = None
+        if key is not None and not is_simple(key):
+            # 参数中有对象（会话、连接等），不缓存
+            key = None
+
+        if key is not None and key in cache:
+            stats["hits"] += 1
+            cache.move_to_end(key)
+            failed, value = cache[key]
+            if failed:
+                raise clone_exception(value)
+            return value
+
+        stats["misses"] += 1
+        try:
+            if is_coroutine:
+                value = await func(**kwargs)
+            else:
+                value = await run_in_threadpool(func, **kwargs)
+        except HTTPException as exc:
+            if key is not None:
+                store(key, (True, exc))
+            raise
+        if key is not None:
+            store(key, (False, value))
+        return value
+
+    def store(key, entry):
+        cache[key] = entry
+        if len(cache) > maxsize:
+            cache.popitem(last=False)
+
+    def cache_info() -> CacheInfo:
+        return CacheInfo(stats["hits"], stats["misses"], maxsize, len(cache))
+
+    def cache_clear():
+        cache.clear()
+        stats["hits"] = stats["misses"] = 0
+
+    # FastAPI 按这个签名解析依赖项的参数
+    wrapper.__signature__ = signature.replace(return_annotation=inspect.Signature.empty)
+    wrapper.cache_info = cache_info
+    wrapper.cache_clear = cache_clear
+    return wrapper
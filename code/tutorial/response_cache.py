@@ -0,0 +1,258 @@
+# 路由级的响应缓存
+# 有些只读路由对同样的输入总是返回同样的响应体，每次都执行路径操作函数、查库、序列化没有必要。
+
+# ResponseCache 提供两个装饰器，写在 @app.get / @app.put 等装饰器的下面：
+
+#     cache = ResponseCache(MemoryBackend(maxsize=1024), ttl=60)
+
+#     @app.get("/items/{item_id}", response_model=Item)
+#     @cache.cached(tag="item:{item_id}", vary=["accept-language"])
+#     async def read_item(item_id: str): ...
+
+#     @app.put("/items/{item_id}", response_model=Item)
+#     @cache.invalidates("item:{item_id}")
+#     async def update_item(item_id: str, item: Item): ...
+
+# - 缓存键由路径、排序后的查询参数和 vary 中列出的请求头组成
+# - 未命中时执行路径操作，按路由的 response_model 序列化后缓存响应体，并计算强 ETag（响应体的哈希）
+# - 请求头 If-None-Match 与 ETag 相同时直接返回 304，不执行路径操作，也不发送响应体
+# - tag 用路径参数格式化，标记缓存项属于哪个资源；写入该资源的路由用 invalidates 使这个 tag 下的所有缓存失效
+# - 响应头 X-Cache 为 HIT 或 MISS
+
+# 失效的实现：每个 tag 有一个版本号（generation），缓存项里记录写入时的版本号，
+# 读取时版本号不一致就视为未命中。这样一次写入只需要更新一个键，
+# 不需要找出这个资源在不同查询参数、不同请求头下的全部缓存项，旧的缓存项由 TTL 或 LRU 自然淘汰。
+# 版本号不存在时（从未失效过，或者被淘汰了）会先写入一个新的随机版本号，避免旧缓存项被重新当作有效。
+
+# 只缓存 200 响应；路径操作抛出的 HTTPException 不会被缓存。
+# 注意：路径操作的依赖项（例如数据库会话）在命中时仍然会执行，跳过的只是路径操作函数本身。
+import base64
+import functools
+import hashlib
+import inspect
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import serialize_response
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+# 任何实现了 get/set(ex=) 的 Redis 协议客户端，例如 redis.Redis
+# 多个进程共用一个 Redis 时，一个进程里的写入会让所有进程的缓存失效
+class RedisBackend:
+    def __init__(self, client, prefix: str = "response:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl) if ttl else None)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+# If-None-Match 使用弱比较：忽略 W/ 前缀
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def snapshot(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl: float = 60):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def _generation(self, tag: Optional[str]) -> Optional[str]:
+        if tag is None:
+            return None
+        key = f"generation:{tag}"
+        generation = self.backend.get(key)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            self.backend.set(key, generation)
+        return generation
+
+    def invalidate(self, tag: str):
+        self.backend.set(f"generation:{tag}", uuid.uuid4().hex)
+
+    @staticmethod
+    def _key(request: Request, vary: Iterable[str]) -> str:
+        query = sorted(request.query_params.multi_items())
+        headers = [request.headers.get(name, "") for name in vary]
+        raw = json.dumps([request.url.path, query, headers])
+        return "entry:" + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    async def _render(request: Request, raw, is_coroutine: bool) -> Response:
+        if isinstance(raw, Response):
+            return raw
+        # 和 FastAPI 处理路径操作返回值的方式相同：按 response_model 校验、过滤，再交给 response_class
+        route = request.scope["route"]
+        content = await serialize_response(
+            field=route.response_field,
+            response_content=raw,
+            include=route.response_model_include,
+            exclude=route.response_model_exclude,
+            by_alias=route.response_model_by_alias,
+            exclude_unset=route.response_model_exclude_unset,
+            exclude_defaults=route.response_model_exclude_defaults,
+            exclude_none=route.response_model_exclude_none,
+            is_coroutine=is_coroutine,
+        )
+        response_class = route.response_class
+        if isinstance(response_class, DefaultPlaceholder):
+            response_class = response_class.value
+        return response_class(content)
+
+    @staticmethod
+    def _respond(
+        entry: Dict[str, Any], request: Request, vary: list, cache_status: str
+    ) -> Response:
+        headers = {"ETag": entry["etag"], "X-Cache": cache_status}
+        if vary:
+            headers["Vary"] = ", ".join(vary)
+        if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+            return Response(status_code=304, headers=headers)
+        body = base64.b64decode(entry["body"])
+        return Response(body, media_type=entry["media_type"], headers=headers)
+
+    def cached(
+        self,
+        tag: Optional[str] = None,
+        vary: Iterable[str] = (),
+        ttl: Optional[float] = None,
+    ):
+        vary = [name.lower() for name in vary]
+        ttl = ttl or self.ttl
+
+        def decorator(func: Callable):
+            is_coroutine = inspect.iscoroutinefunction(func)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request: Request = kwargs.pop("_response_cache_request")
+                resource = tag.format(**kwargs) if tag is not None else None
+                key = self._key(request, vary)
+                generation = self._generation(resource)
+
+                entry = self.backend.get(key)
+                if entry is not None and entry["generation"] == generation:
+                    self.stats.hits += 1
+                    response = self._respond(entry, request, vary, "HIT")
+                    if response.status_code == 304:
+                        self.stats.not_modified += 1
+                    return response
+
+                self.stats.misses += 1
+                if is_coroutine:
+                    raw = await func(*args, **kwargs)
+                else:
+                    raw = await run_in_threadpool(func, *args, **kwargs)
+                response = await self._render(request, raw, is_coroutine)
+                if response.status_code != 200:
+                    return response
+
+                entry = {
+                    "etag": make_etag(response.body),
+                    "body": base64.b64encode(response.body).decode(),
+                    "media_type": response.media_type,
+                    "generation": generation,
+                }
+                self.backend.set(key, entry, ttl)
+                return self._respond(entry, request, vary, "MISS")
+
+            # 在路径操作的参数后面加上 Request，FastAPI 会把当前请求传进来
+            signature = inspect.signature(func)
+            parameters = list(signature.parameters.values())
+            parameters.append(
+                inspect.Parameter(
+                    "_response_cache_request",
+                    inspect.Parameter.KEYWORD_ONLY,
+                    annotation=Request,
+                )
+            )
+            wrapper.__signature__ = signature.replace(parameters=parameters)
+            return wrapper
+
+        return decorator
+
+    # 路径操作成功返回后使这些 tag 失效；抛出异常时不失效
+    def invalidates(self, *tags: str):
+        def decorator(func: Callable):
+            is_coroutine = inspect.iscoroutinefunction(func)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if is_coroutine:
+                    result = await func(*args, **kwargs)
+                else:
+                    result = await run_in_threadpool(func, *args, **kwargs)
+                for tag in tags:
+                    self.invalidate(tag.format(**kwargs))
+                return result
+
+            return wrapper
+
+        return decorator
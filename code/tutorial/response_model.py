@@ -5,7 +5,11 @@ from typing import List, Optional
 from fastapi import FastAPI
 from pydantic import BaseModel, EmailStr
 
+from fast_json import enable_fast_json, trusted_response
+
 app = FastAPI()
+# 快速 JSON 模式，标记了 @trusted_response 的路由使用预编译的字段投影，见 fast_json.py
+enable_fast_json(app)
 
 class Item(BaseModel):
     name: str
@@ -59,6 +63,7 @@ class Item2(BaseModel):
     tags: List[str] = []
 
 
+# 这些 dict 来自我们自己的存储，字段类型已经正确，下面的路由用 @trusted_response 跳过每次请求的校验
 items = {
     "foo": {"name": "Foo", "price": 50.2},
     "bar": {"name": "Bar", "description": "The bartenders", "price": 62, "tax": 20.2},
@@ -66,6 +71,7 @@ items = {
 }
 # 可以设置路径操作装饰器的 response_model_exclude_unset=True 来屏蔽认值的字段输出
 @app.get("/items/{item_id}", response_model=Item2, response_model_exclude_unset=True)
+@trusted_response
 async def read_item(item_id: str):
     return items[item_id]
 
@@ -76,11 +82,13 @@ async def read_item(item_id: str):
     response_model=Item,
     response_model_include={"name", "description"},
 )
+@trusted_response
 async def read_item_name(item_id: str):
     return items[item_id]
 
 
 @app.get("/items/{item_id}/public", response_model=Item, response_model_exclude={"tax"})
+@trusted_response
 async def read_item_public_data(item_id: str):
     return items[item_id]
 
@@ -0,0 +1,246 @@
+# 可续传的分块上传
+# /uploadfile/ 这样一次性上传大文件时，中途网络断开就只能从头再来。
+# 这里把上传拆成一个会话和多个分块：
+
+# 1. POST   /uploads/                     {"filename": "a.bin", "size": 123}，创建会话，返回 upload_id
+# 2. PATCH  /uploads/{upload_id}          请求头 Upload-Offset 指明这一块从文件的哪个位置开始，请求体就是这一块的原始字节
+# 3. HEAD   /uploads/{upload_id}          响应头 Upload-Offset 是从头开始连续收到的字节数，断线后从这里继续；
+#                                         Upload-Ranges 是已经收到的全部区间，例如 0-1048576,2097152-3145728
+# 4. POST   /uploads/{upload_id}/finalize 所有字节都收到后完成上传
+
+# 存储方式：
+# - 创建会话时就按文件大小创建好目标文件（稀疏文件），每一块直接写到它在文件中的位置，
+#   最后完成时只需要把文件 rename 到上传目录，不需要再把分块拼接复制一遍
+# - 每一块完整写入后，在 parts 目录下创建一个名为 "起始-结束" 的空文件作为记录；
+#   写到一半断开的块没有记录，客户端重传即可。记录是按块独立的文件，
+#   同一个会话的多个分块可以并行上传（也可以落在不同的 worker 进程上），不需要加锁
+# - 分块的请求体直接流式写入文件，不经过 UploadFile 的临时文件
+# - 写入分块期间对 data 文件持有共享锁（flock，可以跨 worker 进程），finalize 要先拿到排他锁：
+#   有分块正在写入时 finalize 返回 409，稍后重试；finalize 完成后才拿到锁的 PATCH 发现会话已经不在，返回 409，
+#   不会把数据写进已经完成的文件。同时到达的另一个 finalize 返回 404 或 409
+# - 超过 SESSION_TTL 没有任何写入的会话视为已放弃，创建新会话时顺带清理（最多每 CLEANUP_INTERVAL 一次）
+import fcntl
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import List, Tuple
+
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, conint
+
+RESUMABLE_DIR = "resumable"
+UPLOAD_DIR = "uploads"
+MAX_UPLOAD_SIZE = 10 * 1024 ** 3
+SESSION_TTL = 24 * 3600
+CLEANUP_INTERVAL = 3600
+
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+
+class UploadCreate(BaseModel):
+    filename: str
+    size: conint(ge=0)
+
+
+def upload_not_found() -> HTTPException:
+    return HTTPException(status_code=404, detail="Upload not found")
+
+
+def session_dir(upload_id: str) -> str:
+    # upload_id 只能是我们生成的 uuid，防止通过路径参数访问其他目录
+    try:
+        uuid.UUID(hex=upload_id)
+    except ValueError:
+        raise upload_not_found()
+    path = os.path.join(RESUMABLE_DIR, upload_id)
+    if not os.path.isdir(path):
+        raise upload_not_found()
+    return path
+
+
+# 会话随时可能被 finalize 或清理掉，文件不存在时按会话不存在处理
+def read_info(path: str) -> dict:
+    try:
+        with open(os.path.join(path, "info.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise upload_not_found()
+
+
+# 合并已收到的区间（允许重叠，重传的块会和原来的记录重叠）
+def received_ranges(path: str) -> List[Tuple[int, int]]:
+    try:
+        names = os.listdir(os.path.join(path, "parts"))
+    except FileNotFoundError:
+        raise upload_not_found()
+    ranges = sorted(tuple(int(value) for value in name.split("-")) for name in names)
+    merged: List[List[int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def contiguous_offset(ranges: List[Tuple[int, int]]) -> int:
+    if ranges and ranges[0][0] == 0:
+        return ranges[0][1]
+    return 0
+
+
+def create_session(upload: UploadCreate) -> str:
+    upload_id = uuid.uuid4().hex
+    path = os.path.join(RESUMABLE_DIR, upload_id)
+    os.makedirs(os.path.join(path, "parts"))
+    with open(os.path.join(path, "info.json"), "w") as f:
+        json.dump(upload.dict(), f)
+    # 预先创建指定大小的文件，分块直接写入各自的位置
+    with open(os.path.join(path, "data"), "wb") as f:
+        f.truncate(upload.size)
+    return upload_id
+
+
+# 最后一次写入（创建会话、写入分块、记录分块）的时间
+def last_activity(path: str) -> float:
+    times = []
+    for name in ("", "data", "parts"):
+        try:
+            times.append(os.path.getmtime(os.path.join(path, name)))
+        except FileNotFoundError:
+            pass
+    return max(times, default=0.0)
+
+
+# 删除超过 ttl 没有写入的会话，包括 finalize 中途崩溃留下的 .finalizing 目录
+def cleanup_sessions(ttl: float = SESSION_TTL) -> int:
+    deadline = time.time() - ttl
+    removed = 0
+    try:
+        names = os.listdir(RESUMABLE_DIR)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(RESUMABLE_DIR, name)
+        if last_activity(path) < deadline:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+last_cleanup = 0.0
+
+
+@router.post("/", status_code=201)
+async def create_upload(
+    upload: UploadCreate, response: Response, background_tasks: BackgroundTasks
+):
+    if upload.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail="Upload too large")
+    global last_cleanup
+    if time.monotonic() - last_cleanup >= CLEANUP_INTERVAL:
+        last_cleanup = time.monotonic()
+        background_tasks.add_task(cleanup_sessions)
+    upload_id = await run_in_threadpool(create_session, upload)
+    response.headers["Location"] = f"{router.prefix}/{upload_id}"
+    return {"upload_id": upload_id}
+
+
+@router.head("/{upload_id}")
+async def read_upload_offset(upload_id: str):
+    path = session_dir(upload_id)
+    info = read_info(path)
+    ranges = received_ranges(path)
+    return Response(
+        headers={
+            "Upload-Offset": str(contiguous_offset(ranges)),
+            "Upload-Length": str(info["size"]),
+            "Upload-Ranges": ",".join(f"{start}-{end}" for start, end in ranges),
+            "Cache-Control": "no-store",
+        }
+    )
+
+
+@router.patch("/{upload_id}", status_code=204)
+async def upload_chunk(
+    upload_id: str, request: Request, upload_offset: int = Header(...)
+):
+    path = session_dir(upload_id)
+    size = read_info(path)["size"]
+    if upload_offset < 0 or upload_offset > size:
+        raise HTTPException(status_code=416, detail="Invalid Upload-Offset")
+
+    # 每个请求单独打开文件，并行的分块各自 seek 到自己的位置写入
+    try:
+        f = await run_in_threadpool(open_for_write, path)
+    except FileNotFoundError:
+        raise upload_not_found()
+    # 关闭文件时释放共享锁，分块写完并记录之后才允许 finalize
+    end = upload_offset
+    try:
+        await run_in_threadpool(f.seek, upload_offset)
+        async for chunk in request.stream():
+            end += len(chunk)
+            if end > size:
+                raise HTTPException(status_code=413, detail="Chunk exceeds upload size")
+            await run_in_threadpool(f.write, chunk)
+        if end > upload_offset:
+            # 数据写完之后才记录这一块
+            await run_in_threadpool(record_part, path, upload_offset, end)
+    finally:
+        await run_in_threadpool(f.close)
+    return Response(status_code=204, headers={"Upload-Offset": str(end)})
+
+
+# 打开 data 文件并加共享锁；finalize 在我们打开之后、加锁之前完成时，会话目录已经不在了
+def open_for_write(path: str):
+    f = open(os.path.join(path, "data"), "r+b")
+    fcntl.flock(f, fcntl.LOCK_SH)
+    if not os.path.isdir(path):
+        f.close()
+        raise HTTPException(status_code=409, detail="Upload finalized or expired")
+    return f
+
+
+def record_part(path: str, start: int, end: int):
+    try:
+        open(os.path.join(path, "parts", f"{start}-{end}"), "w").close()
+    except FileNotFoundError:
+        # 写入期间会话被清理掉了，这一块没有被记录
+        raise HTTPException(status_code=409, detail="Upload finalized or expired")
+
+
+def finalize_session(path: str, upload_id: str):
+    with open(os.path.join(path, "data"), "rb") as f:
+        # 有 PATCH 正在写入（持有共享锁）时不等待，让客户端稍后重试
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise HTTPException(status_code=409, detail="Upload has chunks in progress")
+        # 持有排他锁期间移走会话：同时到达的 finalize 只有一个能 rename 成功，其余的得到 FileNotFoundError
+        claimed = path + ".finalizing"
+        os.rename(path, claimed)
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        # 同一个文件系统内 rename 不会复制数据
+        os.replace(os.path.join(claimed, "data"), os.path.join(UPLOAD_DIR, upload_id))
+    shutil.rmtree(claimed)
+
+
+@router.post("/{upload_id}/finalize")
+async def finalize_upload(upload_id: str):
+    path = session_dir(upload_id)
+    info = read_info(path)
+    ranges = received_ranges(path)
+    if info["size"] and ranges != [(0, info["size"])]:
+        raise HTTPException(
+            status_code=409,
+            detail={"msg": "Upload incomplete", "offset": contiguous_offset(ranges)},
+        )
+    try:
+        await run_in_threadpool(finalize_session, path, upload_id)
+    except FileNotFoundError:
+        raise upload_not_found()
+    return {"filename": info["filename"], "stored_name": upload_id, "size": info["size"]}
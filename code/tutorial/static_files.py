@@ -4,10 +4,16 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
+from fast_static import CachedStaticFiles
+
 app = FastAPI()
 
 # 挂载一个静态文件目录
 # 第一个 static 为路由目录
 # 第二个为本地目录
 # 第三个为可由内部调用的名称
-app.mount("/static", StaticFiles(directory="static"), name="static")
\ No newline at end of file
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
+# 带内存缓存、Range、预压缩文件和长期缓存头的版本，用法相同，见 fast_static.py
+# 预压缩文件在构建时生成，例如 gzip -k -9 static/app.js、brotli -k static/app.js
+app.mount("/assets", CachedStaticFiles(directory="static"), name="assets")
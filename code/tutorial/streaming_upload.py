@@ -0,0 +1,215 @@
+# 流式处理 multipart 上传
+# bytes = File(...) 会把整个文件读进内存；
+# UploadFile 虽然会把大文件转存到临时文件，但要等整个请求体解析完，路径操作才开始执行，
+# 上传 5 GB 的文件，就要先在临时目录里写一遍 5 GB，再由路径操作读出来处理。
+
+# stream_multipart 直接读取请求体，边收边解析，每个部分（part）都是一个异步字节流：
+
+#     @app.post("/upload/")
+#     async def upload(request: Request):
+#         async for part in stream_multipart(request, max_part_size=10 * 1024**3):
+#             if part.filename is None:
+#                 value = (await part.read()).decode()      # 普通表单字段
+#             else:
+#                 size, digest = await save_part(part, path) # 写入磁盘的同时计算 sha256
+
+# - 内存中只保留当前收到的一块数据（服务器每次交给应用的块大小，通常是几十 KB）
+# - 文件 part 超过 max_part_size、普通表单字段超过 max_field_size（默认 1 MiB）、
+#   part 数量超过 max_parts 时返回 413；请求体不是合法的 multipart 时返回 400
+# - save_part 写入失败（413、客户端断开连接等）时删除写了一半的文件
+# - 上一个 part 没有读完就去取下一个 part 时，剩下的数据会被跳过
+# 路径操作不能再声明 File/Form 参数，否则 FastAPI 会先把整个请求体解析一遍。
+import hashlib
+import os
+from collections import deque
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import multipart
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import parse_options_header
+except ImportError:
+    multipart = None
+
+# 事件类型
+PART_BEGIN = 0
+HEADER = 1
+HEADERS_FINISHED = 2
+DATA = 3
+PART_END = 4
+END = 5
+
+
+class StreamingPart:
+    def __init__(self, stream: "MultipartStream", headers: Dict[str, str]):
+        self._stream = stream
+        self.headers = headers
+        disposition, options = parse_options_header(headers.get("content-disposition", ""))
+        self.name: Optional[str] = options.get(b"name", b"").decode() or None
+        filename = options.get(b"filename")
+        self.filename: Optional[str] = filename.decode() if filename is not None else None
+        self.content_type: Optional[str] = headers.get("content-type")
+        # 普通表单字段会被整个读进内存，单独限制大小
+        self.max_size = stream.max_part_size if self.filename is not None else stream.max_field_size
+        self.size = 0
+        self.finished = False
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self.finished:
+            raise StopAsyncIteration
+        while True:
+            kind, value = await self._stream.next_event()
+            if kind == DATA:
+                self.size += len(value)
+                if self.size > self.max_size:
+                    raise HTTPException(status_code=413, detail="Part too large")
+                if value:
+                    return value
+            elif kind == PART_END:
+                self.finished = True
+                raise StopAsyncIteration
+            else:
+                raise HTTPException(status_code=400, detail="Malformed multipart body")
+
+    # 读取整个 part，只适合小的表单字段
+    async def read(self) -> bytes:
+        return b"".join([chunk async for chunk in self])
+
+
+class MultipartStream:
+    def __init__(self, request: Request, max_part_size: int, max_field_size: int, max_parts: int):
+        if multipart is None:
+            raise RuntimeError("streaming uploads require: pip install python-multipart")
+        content_type, options = parse_options_header(request.headers.get("content-type", ""))
+        boundary = options.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+        self.max_part_size = max_part_size
+        self.max_field_size = max_field_size
+        self.max_parts = max_parts
+        self._body = request.stream()
+        self._events: deque = deque()
+        self._header_field = b""
+        self._header_value = b""
+        self._parser = multipart.MultipartParser(
+            boundary,
+            {
+                "on_part_begin": lambda: self._events.append((PART_BEGIN, None)),
+                "on_part_data": self._on_data,
+                "on_part_end": lambda: self._events.append((PART_END, None)),
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": lambda: self._events.append((HEADERS_FINISHED, None)),
+                "on_end": lambda: self._events.append((END, None)),
+            },
+        )
+
+    def _on_data(self, data: bytes, start: int, end: int):
+        self._events.append((DATA, data[start:end]))
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        header = (self._header_field.decode("latin-1").lower(), self._header_value.decode("latin-1"))
+        self._events.append((HEADER, header))
+        self._header_field = b""
+        self._header_value = b""
+
+    # 事件用完时才读取下一块请求体，所以内存里最多只有一块数据对应的事件
+    async def next_event(self) -> Tuple[int, object]:
+        while not self._events:
+            try:
+                chunk = await self._body.__anext__()
+            except StopAsyncIteration:
+                self._finalize()
+                if not self._events:
+                    raise HTTPException(status_code=400, detail="Unexpected end of body")
+                break
+            if chunk:
+                self._write(chunk)
+        return self._events.popleft()
+
+    # 解析器遇到非法的请求体时抛出 MultipartParseError，转成 400，而不是 500
+    def _write(self, chunk: bytes):
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError:
+            raise HTTPException(status_code=400, detail="Malformed multipart body")
+
+    def _finalize(self):
+        try:
+            self._parser.finalize()
+        except MultipartParseError:
+            raise HTTPException(status_code=400, detail="Malformed multipart body")
+
+    async def parts(self) -> AsyncIterator[StreamingPart]:
+        count = 0
+        part: Optional[StreamingPart] = None
+        while True:
+            # 跳过上一个 part 没有读完的数据
+            if part is not None and not part.finished:
+                async for _ in part:
+                    pass
+            kind, value = await self.next_event()
+            if kind == END:
+                return
+            if kind != PART_BEGIN:
+                raise HTTPException(status_code=400, detail="Malformed multipart body")
+            count += 1
+            if count > self.max_parts:
+                raise HTTPException(status_code=413, detail="Too many parts")
+            headers = {}
+            while True:
+                kind, value = await self.next_event()
+                if kind == HEADERS_FINISHED:
+                    break
+                if kind != HEADER:
+                    raise HTTPException(status_code=400, detail="Malformed multipart body")
+                headers[value[0]] = value[1]
+            part = StreamingPart(self, headers)
+            yield part
+
+
+def stream_multipart(
+    request: Request,
+    max_part_size: int = 1024 ** 3,
+    max_field_size: int = 1024 ** 2,
+    max_parts: int = 100,
+) -> AsyncIterator[StreamingPart]:
+    return MultipartStream(request, max_part_size, max_field_size, max_parts).parts()
+
+
+# 接收方（sink）：把 part 写入文件，同时计算 sha256
+# 文件写入会阻塞，每一块都放到线程池中执行
+# 没有写完（超过大小限制、客户端断开连接、请求被取消）时删除写了一半的文件
+async def save_part(part: StreamingPart, path: str) -> Tuple[int, str]:
+    digest = hashlib.sha256()
+    try:
+        with open(path, "wb") as f:
+            async for chunk in part:
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return part.size, digest.hexdigest()
+
+
+# 只计算摘要，不落盘
+async def digest_part(part: StreamingPart, algorithm: str = "sha256") -> Tuple[int, str]:
+    digest = hashlib.new(algorithm)
+    async for chunk in part:
+        digest.update(chunk)
+    return part.size, digest.hexdigest()
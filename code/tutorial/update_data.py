@@ -7,10 +7,17 @@
 from typing import List, Optional
 
 from fastapi import FastAPI
-from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 
+from fast_json import enable_fast_json, jsonable
+from response_cache import MemoryBackend, ResponseCache
+
 app = FastAPI()
+# 快速 JSON 模式：response_model=Item 的返回值校验后直接用 orjson 编码，见 fast_json.py
+enable_fast_json(app)
+
+# 读取 item 的响应带 ETag 缓存，PUT/PATCH 修改 item 后对应的缓存失效，见 response_cache.py
+response_cache = ResponseCache(MemoryBackend(maxsize=1024), ttl=60)
 
 
 class Item(BaseModel):
@@ -29,13 +36,15 @@ items = {
 
 
 @app.get("/items/{item_id}", response_model=Item)
+@response_cache.cached(tag="item:{item_id}")
 async def read_item(item_id: str):
     return items[item_id]
 
 # 注意：当传入的数据不包含已储存的属性时，会使用默认属性覆盖原有属性
 @app.put("/items/{item_id}", response_model=Item)
+@response_cache.invalidates("item:{item_id}")
 async def update_item(item_id: str, item: Item):
-    update_item_encoded = jsonable_encoder(item)
+    update_item_encoded = jsonable(item)
     items[item_id] = update_item_encoded
     return update_item_encoded
 
@@ -50,12 +59,13 @@ async def update_item(item_id: str, item: Item):
 # 然后再用它生成一个只含已设置（在请求中所发送）数据，且省略了默认值的 dict
 # 接下来，用 .copy() 为已有模型创建调用 update 参数的副本，该参数为包含更新数据的 dict。
 @app.patch("/items/{item_id}", response_model=Item)
+@response_cache.invalidates("item:{item_id}")
 async def update_item2(item_id: str, item: Item):
     stored_item_data = items[item_id]
     stored_item_model = Item(**stored_item_data)
     update_data = item.dict(exclude_unset=True)
     updated_item = stored_item_model.copy(update=update_data)
-    items[item_id] = jsonable_encoder(updated_item)
+    items[item_id] = jsonable(updated_item)
     return updated_item
 
 """简而言之，更新部分数据应：
@@ -66,7 +76,7 @@ async def update_item2(item_id: str, item: Item):
 4. 生成不含输入模型默认值的 dict （使用 exclude_unset 参数）；
     只更新用户设置过的值，不用模型中的默认值覆盖已存储过的值。
 5. 为已存储的模型创建副本，用接收的数据更新其属性 （使用 update 参数）。
-6. 把模型副本转换为可存入数据库的形式（比如，使用 jsonable_encoder）。
+6. 把模型副本转换为可存入数据库的形式（比如，使用 jsonable_encoder，这里用的是结果相同、更快的 fast_json.jsonable）。
     这种方式与 Pydantic 模型的 .dict() 方法类似，但能确保把值转换为适配 JSON 的数据类型，例如， 把 datetime 转换为 str 。
 7. 把数据保存至数据库；
 8. 返回更新后的模型。"""
\ No newline at end of file